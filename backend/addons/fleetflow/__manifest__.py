@@ -3,11 +3,15 @@
     'version': '1.0',
     'category': 'Logistics',
     'summary': 'Modular Fleet & Logistics Management System',
-    'depends': ['base', 'mail'],
+    'depends': ['base', 'bus', 'mail'],
+    'external_dependencies': {
+        'python': ['numpy', 'scipy'],
+    },
     'data': [
         'security/security.xml',
         'security/ir.model.access.csv',
         'data/demo_data.xml',
+        'data/cron.xml',
     ],
     'demo': [],
     'installable': True,
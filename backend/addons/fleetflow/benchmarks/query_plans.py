@@ -0,0 +1,166 @@
+"""Query-plan regression benchmark for the FleetFlow hot paths.
+
+Seeds a large synthetic fleet inside a savepoint, refreshes planner statistics and
+asserts that the queries behind the dashboard, alerts, maintenance close-out, time
+alert cron and list endpoints are answered from indexes. Everything is rolled back.
+
+    $ odoo-bin shell -d <db>
+    >>> from odoo.addons.fleetflow.benchmarks import query_plans
+    >>> query_plans.run(env)
+"""
+import json
+import logging
+import time
+
+_logger = logging.getLogger(__name__)
+
+INDEX_NODES = {'Index Scan', 'Index Only Scan', 'Bitmap Index Scan'}
+TABLES = ['fleetflow_vehicle', 'fleetflow_driver', 'fleetflow_trip', 'fleetflow_maintenance_log', 'fleetflow_fuel_log', 'fleetflow_alert']
+
+# name -> (query, acceptable indexes)
+QUERIES = {
+    'dashboard pending trips': (
+        "SELECT COUNT(*) FROM fleetflow_trip t JOIN fleetflow_vehicle tv ON tv.id = t.vehicle_id WHERE t.state = 'Draft'",
+        {'fleetflow_trip_open_idx'},
+    ),
+    'alerts list': (
+        "SELECT id FROM fleetflow_alert WHERE active ORDER BY raised_at DESC, id DESC",
+        {'fleetflow_alert_active_raised_at_idx'},
+    ),
+    'maintenance open logs per vehicle': (
+        "SELECT vehicle_id, COUNT(*) FROM fleetflow_maintenance_log WHERE vehicle_id = ANY(%(vehicles)s) AND state = 'Open' GROUP BY vehicle_id",
+        {'fleetflow_maintenance_log_vehicle_state_idx'},
+    ),
+    'delayed trips cron': (
+        "SELECT id FROM fleetflow_trip WHERE state IN ('Draft', 'Dispatched') AND planned_start_date < now() at time zone 'UTC'",
+        {'fleetflow_trip_open_idx', 'fleetflow_trip__planned_start_date_index'},
+    ),
+    'expiring licenses cron': (
+        "SELECT id FROM fleetflow_driver WHERE license_expiry_date <= current_date + 30",
+        {'fleetflow_driver__license_expiry_date_index'},
+    ),
+    'trips list page': (
+        "SELECT id FROM fleetflow_trip WHERE id > %(after)s ORDER BY id LIMIT 100",
+        {'fleetflow_trip_pkey'},
+    ),
+    'vehicle availability window': (
+        """SELECT id FROM fleetflow_trip
+            WHERE state IN ('Draft', 'Dispatched')
+              AND tsrange(planned_start_date, planned_end_date) && tsrange((now() at time zone 'UTC')::timestamp, (now() at time zone 'UTC')::timestamp + interval '2 hours')""",
+        {'fleetflow_trip_open_window_idx', 'fleetflow_trip_vehicle_schedule_overlap', 'fleetflow_trip_driver_schedule_overlap'},
+    ),
+    'trips of vehicle': (
+        "SELECT id FROM fleetflow_trip WHERE vehicle_id = %(vehicle)s",
+        {'fleetflow_trip__vehicle_id_index'},
+    ),
+    'fuel of vehicle by period': (
+        "SELECT id FROM fleetflow_fuel_log WHERE vehicle_id = %(vehicle)s AND date >= current_date - 90",
+        {'fleetflow_fuel_log_vehicle_date_idx'},
+    ),
+    'previous fuel fill': (
+        """SELECT odometer_at_fill FROM fleetflow_fuel_log
+            WHERE vehicle_id = %(vehicle)s AND (odometer_at_fill, id) < (%(odometer)s, 2147483647)
+         ORDER BY odometer_at_fill DESC, id DESC LIMIT 1""",
+        {'fleetflow_fuel_log_vehicle_odometer_idx'},
+    ),
+}
+
+
+def _seed(cr, scale):
+    vehicles, drivers = 2000 * scale, 2000 * scale
+    cr.execute("""
+        INSERT INTO fleetflow_vehicle (name, license_plate, vehicle_type, region, max_load_capacity, odometer, status)
+             SELECT 'Bench ' || n, 'BENCH-' || n, (ARRAY['car', 'truck', 'van'])[1 + n %% 3],
+                    (ARRAY['North', 'South', 'East', 'West'])[1 + n %% 4], 20000, 0,
+                    (ARRAY['Available', 'On Trip', 'In Shop', 'Available', 'Available'])[1 + n %% 5]
+               FROM generate_series(1, %s) n
+          RETURNING id
+    """, (vehicles,))
+    vehicle_ids = [row[0] for row in cr.fetchall()]
+    cr.execute("""
+        INSERT INTO fleetflow_driver (name, license_number, license_expiry_date, status, safety_score, trip_count, completed_trip_count, completion_rate)
+             SELECT 'Bench Driver ' || n, 'BL-' || n,
+                    current_date + CASE WHEN n %% 100 = 0 THEN 10 ELSE 400 + n %% 1000 END,
+                    'On Duty', 100, 0, 0, 100
+               FROM generate_series(1, %s) n
+          RETURNING id
+    """, (drivers,))
+    driver_ids = [row[0] for row in cr.fetchall()]
+    params = {'vehicles': vehicle_ids, 'drivers': driver_ids}
+    # Open trips (n % 20 < 2) get one staggered 2-6h window per day and vehicle/driver, so they never
+    # trip the overlap exclusions; the first day's windows straddle now() and overlap the probe window.
+    cr.execute("""
+        INSERT INTO fleetflow_trip (name, vehicle_id, driver_id, source, destination, planned_start_date, planned_end_date, cargo_weight, distance_km, revenue, state)
+             SELECT 'BENCH' || n, %(vehicles)s[1 + n %% array_length(%(vehicles)s, 1)], %(drivers)s[1 + n %% array_length(%(drivers)s, 1)],
+                    'A', 'B', s.start, s.start + make_interval(hours => s.hours), 100, 50, 500,
+                    CASE WHEN n %% 20 = 0 THEN 'Draft' WHEN n %% 20 = 1 THEN 'Dispatched' WHEN n %% 20 = 2 THEN 'Cancelled' ELSE 'Completed' END
+               FROM generate_series(1, %(count)s) n,
+                    LATERAL (SELECT CASE WHEN n %% 20 < 2
+                                         THEN (now() at time zone 'UTC') + make_interval(days => n / array_length(%(vehicles)s, 1), hours => -(n %% 6))
+                                         ELSE (now() at time zone 'UTC') - make_interval(days => n %% 700, hours => n %% 24)
+                                    END AS start,
+                                    CASE WHEN n %% 20 < 2 THEN 2 + n %% 5 ELSE 1 + n %% 8 END AS hours) s
+    """, dict(params, count=100000 * scale))
+    cr.execute("""
+        INSERT INTO fleetflow_maintenance_log (vehicle_id, date, service_type, cost, state)
+             SELECT %(vehicles)s[1 + n %% array_length(%(vehicles)s, 1)], current_date - n %% 700, 'Service', 100,
+                    CASE WHEN n %% 50 = 0 THEN 'Open' ELSE 'Done' END
+               FROM generate_series(1, %(count)s) n
+    """, dict(params, count=50000 * scale))
+    cr.execute("""
+        INSERT INTO fleetflow_fuel_log (vehicle_id, date, liters, cost, odometer_at_fill, segment_km, km_per_liter)
+             SELECT %(vehicles)s[1 + n %% array_length(%(vehicles)s, 1)], current_date - (n / array_length(%(vehicles)s, 1)) %% 700,
+                    40, 60, (n / array_length(%(vehicles)s, 1)) * 400, 0, 0
+               FROM generate_series(1, %(count)s) n
+    """, dict(params, count=100000 * scale))
+    cr.execute("""
+        INSERT INTO fleetflow_alert (key, title, message, type, active, raised_at)
+             SELECT 'bench_' || n, 'Bench', 'Bench alert', 'info', n %% 50 = 0, (now() at time zone 'UTC') - make_interval(mins => n)
+               FROM generate_series(1, %s) n
+    """, (20000 * scale,))
+    return vehicle_ids
+
+
+def _index_nodes(plan):
+    nodes = []
+    if plan.get('Node Type') in INDEX_NODES:
+        nodes.append(plan.get('Index Name'))
+    for child in plan.get('Plans', []):
+        nodes.extend(_index_nodes(child))
+    return nodes
+
+
+def run(env, scale=1):
+    cr = env.cr
+    env.flush_all()
+    failures = []
+    try:
+        with cr.savepoint():
+            start = time.monotonic()
+            vehicle_ids = _seed(cr, scale)
+            for table in TABLES:
+                cr.execute(f"ANALYZE {table}")
+            _logger.info("Seeded benchmark data in %.1fs", time.monotonic() - start)
+            params = {'vehicles': vehicle_ids[:50], 'vehicle': vehicle_ids[len(vehicle_ids) // 2], 'after': 1000, 'odometer': 10000}
+            for name, (query, expected) in QUERIES.items():
+                cr.execute("EXPLAIN (FORMAT JSON) " + query, params)
+                plan = cr.fetchone()[0]
+                plan = json.loads(plan) if isinstance(plan, str) else plan
+                used = _index_nodes(plan[0]['Plan'])
+                ok = bool(expected.intersection(used))
+                _logger.info("%-36s %s %s", name, 'OK  ' if ok else 'FAIL', ', '.join(filter(None, used)) or 'sequential scan')
+                if not ok:
+                    failures.append(f"{name}: expected one of {sorted(expected)}, plan used {used or 'no index'}")
+            raise _Rollback()
+    except _Rollback:
+        pass
+    env.invalidate_all()
+    for table in TABLES:
+        cr.execute(f"ANALYZE {table}")
+    if failures:
+        raise AssertionError("Query plan regressions:\n" + '\n'.join(failures))
+    return True
+
+
+class _Rollback(Exception):
+    pass
@@ -1,9 +1,32 @@
+import codecs
+import csv
+import hashlib
 import json
-from datetime import date, datetime
-from odoo import http
+import psycopg2
+from odoo import fields, http
+from odoo.exceptions import UserError, ValidationError
 from odoo.http import request
 
-_STATIC_ALERTS = []
+from ..models.res_users import ROLE_BITS, ROLE_GROUPS
+
+MAX_PAGE_SIZE = 500
+
+BULK_CHUNK_SIZE = 1000
+# Per-row data problems; anything else (serialization failures, deadlocks) aborts the request so Odoo can retry it.
+BULK_ROW_ERRORS = (ValidationError, UserError, psycopg2.IntegrityError, psycopg2.DataError, ValueError, TypeError)
+BULK_FIELDS = {
+    'fleetflow.fuel_log': ['vehicle_id', 'date', 'liters', 'cost', 'odometer_at_fill'],
+    'fleetflow.maintenance_log': ['vehicle_id', 'date', 'service_type', 'notes', 'cost', 'state'],
+}
+
+# resource -> (model, readable fields, other models whose changes alter its payload, for the ETag)
+LIST_RESOURCES = {
+    'vehicles': ('fleetflow.vehicle', ['id', 'name', 'license_plate', 'status', 'vehicle_type', 'max_load_capacity', 'odometer', 'total_fuel_cost', 'total_maintenance_cost', 'total_operational_cost', 'fuel_efficiency', 'efficiency_30d', 'efficiency_90d', 'efficiency_365d', 'maintenance_risk', 'next_service_due_km'], ['fleetflow.fuel_log', 'fleetflow.maintenance_log']),
+    'trips': ('fleetflow.trip', ['id', 'name', 'vehicle_id', 'driver_id', 'state', 'revenue', 'distance_km', 'source', 'destination', 'cargo_weight', 'planned_start_date', 'planned_end_date'], ['fleetflow.vehicle', 'fleetflow.driver']),
+    'drivers': ('fleetflow.driver', ['id', 'name', 'license_number', 'license_expiry_date', 'status', 'safety_score', 'completion_rate'], ['fleetflow.trip']),
+    'maintenance': ('fleetflow.maintenance_log', ['id', 'vehicle_id', 'date', 'service_type', 'cost', 'state'], ['fleetflow.vehicle']),
+    'fuel': ('fleetflow.fuel_log', ['id', 'vehicle_id', 'date', 'liters', 'cost', 'odometer_at_fill', 'segment_km', 'km_per_liter', 'anomaly_score', 'is_anomaly'], ['fleetflow.vehicle']),
+}
 
 class FleetFlowAPI(http.Controller):
 
@@ -13,28 +36,186 @@ class FleetFlowAPI(http.Controller):
             return False
         return True
 
+    def _role_mask(self):
+        # Cached per user in the registry and cleared whenever group membership changes.
+        return request.env.user._fleetflow_role_mask()
+
     def _get_roles(self):
-        user = request.env.user
-        roles = []
-        if user.has_group('fleetflow.group_fleet_manager'): roles.append('manager')
-        if user.has_group('fleetflow.group_dispatcher'): roles.append('dispatcher')
-        if user.has_group('fleetflow.group_safety_officer'): roles.append('safety')
-        if user.has_group('fleetflow.group_financial_analyst'): roles.append('finance')
-        return roles
+        mask = self._role_mask()
+        return [role for role, _xmlid in ROLE_GROUPS if mask & ROLE_BITS[role]]
 
     def _has_role(self, *allowed_roles):
-        roles = self._get_roles()
-        if 'manager' in roles: return True
+        mask = self._role_mask()
+        if mask & ROLE_BITS['manager']: return True
         for r in allowed_roles:
-            if r in roles: return True
+            if mask & ROLE_BITS.get(r, 0): return True
         return False
 
-    def _response(self, data, status=200):
+    def _search_page(self, model, domain, field_names, kw):
+        # Without a limit the endpoint keeps returning the plain list for small installs.
+        if not kw.get('limit'):
+            return model.search_read(domain, field_names), None
+        limit = max(1, min(int(kw['limit']), MAX_PAGE_SIZE))
+        after = kw.get('after')
+        if after:
+            domain = domain + [('id', '>', int(after))]
+        records = model.search_read(domain, field_names, order='id', limit=limit + 1)
+        next_cursor = records[limit - 1]['id'] if len(records) > limit else None
+        return records[:limit], next_cursor
+
+    def _page_response(self, records, next_cursor, kw, etag=None):
+        if not kw.get('limit'):
+            return self._response(records, etag=etag)
+        return self._response({'records': records, 'next_cursor': next_cursor}, etag=etag)
+
+    def _read_resource(self, resource, kw, filters=None, field_names=None):
+        model_name, allowed, _deps = LIST_RESOURCES[resource]
+        field_names = [f for f in (field_names or allowed) if f in allowed]
+        if 'id' not in field_names:
+            field_names.insert(0, 'id')
+        domain = []
+        for f, value in (filters or {}).items():
+            if f not in allowed:
+                raise ValueError(f"Cannot filter {resource} on {f}")
+            domain.append((f, 'in' if isinstance(value, list) else '=', value))
+        records, next_cursor = self._search_page(request.env[model_name].sudo(), domain, field_names, kw)
+        for r in records:
+            for f in ('vehicle_id', 'driver_id'):
+                if f in r:
+                    r[f.replace('_id', '_name')] = r[f][1] if r[f] else ''
+            for f in ('date', 'planned_start_date', 'planned_end_date', 'license_expiry_date'):
+                if r.get(f): r[f] = str(r[f])
+        return records, next_cursor
+
+    def _list_response(self, resource, kw):
+        model_name, _allowed, deps = LIST_RESOURCES[resource]
+        etag = self._collection_etag(model_name, *deps)
+        not_modified = self._not_modified(etag)
+        if not_modified: return not_modified
+        try:
+            records, next_cursor = self._read_resource(resource, kw)
+        except ValueError as e:
+            return self._response({'error': 'Invalid pagination parameters', 'details': str(e)}, 400)
+        return self._page_response(records, next_cursor, kw, etag=etag)
+
+    def _iter_bulk_rows(self):
+        # Parsed straight off the request stream: CSV with a header line, otherwise NDJSON.
+        stream = request.httprequest.stream
+        if 'csv' in (request.httprequest.content_type or ''):
+            reader = csv.reader(codecs.iterdecode(stream, 'utf-8-sig'))
+            line_no = 1
+            try:
+                header = next(reader, [])
+            except (csv.Error, UnicodeDecodeError) as e:
+                yield line_no, ValueError(f"Unreadable CSV header: {e}")
+                return
+            while True:
+                line_no += 1
+                try:
+                    row = next(reader)
+                except StopIteration:
+                    return
+                except csv.Error as e:
+                    # The reader has consumed the broken record and can carry on with the next one.
+                    yield line_no, e
+                    continue
+                except UnicodeDecodeError as e:
+                    yield line_no, ValueError(f"Invalid UTF-8, rows from here on were not imported: {e}")
+                    return
+                if row:
+                    yield line_no, dict(zip(header, row))
+        else:
+            for line_no, line in enumerate(stream, start=1):
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    yield line_no, json.loads(line)
+                except ValueError as e:
+                    yield line_no, e
+
+    def _coerce_bulk_row(self, model, row):
+        if not isinstance(row, dict):
+            raise ValueError(str(row) if isinstance(row, Exception) else 'Row must be an object')
+        vals = {}
+        for name in BULK_FIELDS[model._name]:
+            value = row.get(name)
+            if value in (None, ''):
+                continue
+            ftype = model._fields[name].type
+            if ftype == 'float':
+                value = float(value)
+            elif ftype in ('integer', 'many2one'):
+                value = int(value)
+            vals[name] = value
+        return vals
+
+    def _bulk_insert_chunk(self, model, chunk, errors):
+        existing_vehicles = set(request.env['fleetflow.vehicle'].sudo().browse(list({vals['vehicle_id'] for _line, vals in chunk if vals.get('vehicle_id')})).exists().ids)
+        valid = []
+        for line_no, vals in chunk:
+            if vals.get('vehicle_id') not in existing_vehicles:
+                errors.append({'row': line_no, 'error': 'Unknown or missing vehicle_id'})
+            else:
+                valid.append((line_no, vals))
+        if not valid:
+            return 0
+        try:
+            # One create() per chunk: cost deltas and fuel segment/bucket updates are applied once per chunk.
+            # A rolled-back chunk also drops the events and alert pushes it queued, so the row retry cannot duplicate them.
+            with request.env.cr.savepoint():
+                model.create([vals for _line, vals in valid])
+                request.env.flush_all()
+            return len(valid)
+        except BULK_ROW_ERRORS:
+            pass
+        created = 0
+        for line_no, vals in valid:
+            try:
+                with request.env.cr.savepoint():
+                    model.create(vals)
+                    request.env.flush_all()
+                created += 1
+            except BULK_ROW_ERRORS as e:
+                errors.append({'row': line_no, 'error': str(e)})
+        return created
+
+    def _bulk_import(self, model_name):
+        model = request.env[model_name].sudo()
+        created, errors, chunk = 0, [], []
+        for line_no, row in self._iter_bulk_rows():
+            try:
+                chunk.append((line_no, self._coerce_bulk_row(model, row)))
+            except (ValueError, TypeError) as e:
+                errors.append({'row': line_no, 'error': str(e)})
+            if len(chunk) >= BULK_CHUNK_SIZE:
+                created += self._bulk_insert_chunk(model, chunk, errors)
+                chunk = []
+        if chunk:
+            created += self._bulk_insert_chunk(model, chunk, errors)
+        return self._response({'created': created, 'failed': len(errors), 'errors': errors})
+
+    def _collection_etag(self, *model_names):
+        # Per-model change counters bumped after each commit; the query string scopes it to the requested page/filters.
+        versions = request.env['fleetflow.collection_version'].sudo()._versions(model_names)
+        parts = [f"{name}:{version}" for name, version in zip(model_names, versions)]
+        parts.append(request.httprequest.query_string.decode())
+        return hashlib.sha1('|'.join(parts).encode()).hexdigest()
+
+    def _not_modified(self, etag):
+        if request.httprequest.if_none_match.contains_weak(etag):
+            return request.make_response('', headers=[('ETag', f'"{etag}"'), ('Cache-Control', 'private, no-cache')], status=304)
+        return None
+
+    def _response(self, data, status=200, etag=None):
         if status != 200 and 'error' in data:
             data = {'code': status, 'message': data['error'], 'details': data.get('details', '')}
+        headers = [('Content-Type', 'application/json')]
+        if etag:
+            headers += [('ETag', f'"{etag}"'), ('Cache-Control', 'private, no-cache')]
         return request.make_response(
             json.dumps(data),
-            headers=[('Content-Type', 'application/json')],
+            headers=headers,
             status=status
         )
 
@@ -118,53 +299,23 @@ class FleetFlowAPI(http.Controller):
     @http.route('/api/dashboard', type='http', auth='public', methods=['GET'], cors='*', csrf=False)
     def get_dashboard(self, **kw):
         if not self._auth_check(): return self._response({'error': 'Unauthorized'}, 401)
-        v_env = request.env['fleetflow.vehicle'].sudo()
-        t_env = request.env['fleetflow.trip'].sudo()
-        
-        v_domain = []
         region = kw.get('region')
-        if region and region != 'all':
-            region_map = {'north': 'North India', 'south': 'South India', 'east': 'East India', 'west': 'West India'}
-            if region in region_map:
-                v_domain.append(('region', '=', region_map[region]))
-                
+        region_map = {'north': 'North India', 'south': 'South India', 'east': 'East India', 'west': 'West India'}
+        region = region_map.get(region) if region and region != 'all' else None
         v_type = kw.get('type')
-        if v_type and v_type != 'all':
-            v_domain.append(('vehicle_type', '=', v_type))
-            
+        v_type = v_type if v_type and v_type != 'all' else None
         status = kw.get('status')
-        if status and status != 'all':
-            v_domain.append(('status', '=', status))
-            
-        vehicles = v_env.search(v_domain)
-        total = len(vehicles)
-        active_fleet = len(vehicles.filtered(lambda v: v.status == 'On Trip'))
-        in_shop = len(vehicles.filtered(lambda v: v.status == 'In Shop'))
-        
-        t_domain = [('state', '=', 'Draft')]
-        if v_domain:
-            if not vehicles:
-                t_domain.append(('id', '=', 0))
-            else:
-                t_domain.append(('vehicle_id', 'in', vehicles.ids))
-
-        pending_trips = t_env.search_count(t_domain)
-        util_rate = (active_fleet / total * 100) if total > 0 else 0
-        
-        return self._response({
-            'active_fleet': active_fleet,
-            'maintenance_alerts': in_shop,
-            'utilization_rate': util_rate,
-            'pending_trips': pending_trips,
-            'total_vehicles': total
-        })
+        status = status if status and status != 'all' else None
+        try:
+            return self._response(request.env['fleetflow.analytics'].sudo().get_dashboard_kpis(region, v_type, status))
+        except UserError as e:
+            return self._response({'error': str(e)}, 400)
 
     @http.route('/api/vehicles', type='http', auth='public', methods=['GET'], cors='*', csrf=False)
-    def get_vehicles(self):
+    def get_vehicles(self, **kw):
         if not self._auth_check(): return self._response({'error': 'Unauthorized'}, 401)
         if not self._has_role('dispatcher', 'safety', 'finance'): return self._response({'error': 'Forbidden'}, 403)
-        vehicles = request.env['fleetflow.vehicle'].sudo().search_read([], ['id', 'name', 'license_plate', 'status', 'vehicle_type', 'max_load_capacity', 'odometer', 'total_fuel_cost', 'total_maintenance_cost', 'total_operational_cost'])
-        return self._response(vehicles)
+        return self._list_response('vehicles', kw)
 
     @http.route('/api/vehicles/new', type='http', auth='public', methods=['POST'], cors='*', csrf=False)
     def create_vehicle(self):
@@ -177,6 +328,21 @@ class FleetFlowAPI(http.Controller):
         except Exception as e:
             return self._response({'error': str(e)}, 400)
 
+    @http.route('/api/vehicles/available', type='http', auth='public', methods=['GET'], cors='*', csrf=False)
+    def get_available_vehicles(self, **kw):
+        if not self._auth_check(): return self._response({'error': 'Unauthorized'}, 401)
+        if not self._has_role('dispatcher'): return self._response({'error': 'Forbidden'}, 403)
+        try:
+            start = fields.Datetime.to_datetime(kw.get('start'))
+            end = fields.Datetime.to_datetime(kw.get('end'))
+            capacity = float(kw.get('capacity') or 0)
+        except ValueError as e:
+            return self._response({'error': str(e)}, 400)
+        if not start or not end or end < start:
+            return self._response({'error': 'start and end are required and end must not be before start'}, 400)
+        vehicles = request.env['fleetflow.vehicle'].sudo().available_between(start, end, capacity, kw.get('region') or None)
+        return self._response(vehicles.read(['id', 'name', 'license_plate', 'vehicle_type', 'region', 'max_load_capacity', 'status']))
+
     @http.route('/api/vehicles/action', type='http', auth='public', methods=['POST'], cors='*', csrf=False)
     def update_vehicle(self):
         if not self._auth_check(): return self._response({'error': 'Unauthorized'}, 401)
@@ -227,21 +393,27 @@ class FleetFlowAPI(http.Controller):
         return self._response({'error': 'Not found'}, 404)
 
     @http.route('/api/trips', type='http', auth='public', methods=['GET'], cors='*', csrf=False)
-    def get_trips(self):
+    def get_trips(self, **kw):
         if not self._auth_check(): return self._response({'error': 'Unauthorized'}, 401)
         if not self._has_role('dispatcher', 'safety', 'finance'): return self._response({'error': 'Forbidden'}, 403)
-        trips = request.env['fleetflow.trip'].sudo().search_read([], ['id', 'name', 'vehicle_id', 'driver_id', 'state', 'revenue', 'distance_km', 'source', 'destination', 'cargo_weight', 'planned_start_date'])
-        for t in trips:
-            t['vehicle_name'] = t['vehicle_id'][1] if t['vehicle_id'] else ''
-            t['driver_name'] = t['driver_id'][1] if t['driver_id'] else ''
-            if t.get('planned_start_date'): t['planned_start_date'] = str(t['planned_start_date'])
-        return self._response(trips)
+        return self._list_response('trips', kw)
 
     @http.route('/api/trips/dispatch', type='http', auth='public', methods=['POST'], cors='*', csrf=False)
     def dispatch_trip(self):
         if not self._auth_check(): return self._response({'error': 'Unauthorized'}, 401)
         if not self._has_role('dispatcher'): return self._response({'error': 'Forbidden'}, 403)
         params = json.loads(request.httprequest.data)
+        if 'trip_ids' in params:
+            try:
+                trip_ids = [int(tid) for tid in params.get('trip_ids') or []]
+            except (TypeError, ValueError):
+                return self._response({'error': 'trip_ids must be a list of ids'}, 400)
+            results = request.env['fleetflow.trip'].sudo().dispatch_batch(trip_ids)
+            return self._response({
+                'results': results,
+                'dispatched': [r['id'] for r in results if r['status'] == 'dispatched'],
+                'skipped': [r['id'] for r in results if r['status'] != 'dispatched'],
+            })
         trip_id = params.get('trip_id')
         trip = request.env['fleetflow.trip'].sudo().browse(trip_id)
         if trip:
@@ -252,6 +424,42 @@ class FleetFlowAPI(http.Controller):
                 return self._response({'error': str(e)}, 400)
         return self._response({'error': 'Not found'}, 404)
 
+    @http.route('/api/trips/optimize', type='http', auth='public', methods=['POST'], cors='*', csrf=False)
+    def optimize_trips(self):
+        if not self._auth_check(): return self._response({'error': 'Unauthorized'}, 401)
+        if not self._has_role('dispatcher'): return self._response({'error': 'Forbidden'}, 403)
+        params = json.loads(request.httprequest.data or b'{}')
+        optimizer = request.env['fleetflow.optimizer'].sudo()
+        try:
+            trip_ids = [int(tid) for tid in params.get('trip_ids') or []]
+            proposal = optimizer.propose_assignment(trip_ids or None)
+        except (TypeError, ValueError, UserError) as e:
+            return self._response({'error': str(e)}, 400)
+        if params.get('apply'):
+            proposal['results'] = optimizer.apply_plan(proposal['plan'])
+        return self._response(proposal)
+
+    @http.route('/api/lanes', type='http', auth='public', methods=['GET'], cors='*', csrf=False)
+    def get_lane(self, **kw):
+        if not self._auth_check(): return self._response({'error': 'Unauthorized'}, 401)
+        if not self._has_role('dispatcher'): return self._response({'error': 'Forbidden'}, 403)
+        if not kw.get('source') or not kw.get('destination'):
+            return self._response({'error': 'source and destination are required'}, 400)
+        distance = request.env['fleetflow.lane'].sudo().lookup(kw['source'], kw['destination'])
+        if distance is None:
+            return self._response({'error': 'Unknown lane'}, 404)
+        return self._response({'source': kw['source'], 'destination': kw['destination'], 'distance_km': distance})
+
+    @http.route('/api/lanes/import', type='http', auth='public', methods=['POST'], cors='*', csrf=False)
+    def import_lanes(self):
+        if not self._auth_check(): return self._response({'error': 'Unauthorized'}, 401)
+        if not self._has_role(): return self._response({'error': 'Forbidden'}, 403) # Only manager
+        try:
+            loaded = request.env['fleetflow.lane'].sudo().preload_matrix(codecs.iterdecode(request.httprequest.stream, 'utf-8-sig'))
+        except (ValueError, csv.Error) as e:
+            return self._response({'error': str(e)}, 400)
+        return self._response({'loaded': loaded})
+
     @http.route('/api/trips/action', type='http', auth='public', methods=['POST'], cors='*', csrf=False)
     def trip_action(self):
         if not self._auth_check(): return self._response({'error': 'Unauthorized'}, 401)
@@ -277,19 +485,20 @@ class FleetFlowAPI(http.Controller):
         if not self._has_role('dispatcher'): return self._response({'error': 'Forbidden'}, 403)
         params = json.loads(request.httprequest.data)
         try:
-            trip = request.env['fleetflow.trip'].sudo().create(params)
+            # The savepoint drops the rejected trip while keeping the event written below.
+            with request.env.cr.savepoint():
+                trip = request.env['fleetflow.trip'].sudo().create(params)
             return self._response({'id': trip.id})
         except Exception as e:
             if "Too heavy" in str(e):
                 vehicle = request.env['fleetflow.vehicle'].sudo().browse(params.get('vehicle_id'))
                 if vehicle:
-                    _STATIC_ALERTS.insert(0, {
-                        'id': f"ow_{datetime.now().timestamp()}",
-                        'title': 'Overweight Attempt',
-                        'message': f"Attempted to dispatch {params.get('cargo_weight', 0)}kg on {vehicle.name} (limit: {vehicle.max_load_capacity}kg).",
-                        'type': 'error',
-                        'timestamp': str(datetime.now())
-                    })
+                    alert = request.env['fleetflow.event'].sudo()._record(
+                        'Overweight Attempt',
+                        f"Attempted to dispatch {params.get('cargo_weight', 0)}kg on {vehicle.name} (limit: {vehicle.max_load_capacity}kg).",
+                        'error'
+                    )
+                    request.env['fleetflow.alert']._push_alert(alert)
             return self._response({'error': str(e)}, 400)
 
     @http.route('/api/alerts', type='http', auth='public', methods=['GET'], cors='*', csrf=False)
@@ -297,55 +506,37 @@ class FleetFlowAPI(http.Controller):
         if not self._auth_check(): return self._response({'error': 'Unauthorized'}, 401)
         
         alerts = []
-        alerts.extend(_STATIC_ALERTS[:15])
-        
-        # Vehicles
-        vehicles = request.env['fleetflow.vehicle'].sudo().search([])
-        for v in vehicles:
-            if v.status == 'In Shop':
-                alerts.append({'id': f'v_shop_{v.id}', 'title': 'Vehicle In Shop', 'message': f'{v.name} ({v.license_plate}) is undergoing maintenance.', 'type': 'info', 'timestamp': str(datetime.now())})
-            elif v.status == 'Available' and v.odometer > 5000:
-                alerts.append({'id': f'v_maint_{v.id}', 'title': 'Maintenance Due', 'message': f'{v.name} ({v.license_plate}) has crossed the 5000km service threshold.', 'type': 'warning', 'timestamp': str(datetime.now())})
-                
-        # Drivers
-        drivers = request.env['fleetflow.driver'].sudo().search([])
-        today = date.today()
-        for d in drivers:
-            if d.license_expiry_date:
-                days = (d.license_expiry_date - today).days
-                if days < 0:
-                    alerts.append({'id': f'd_exp_{d.id}', 'title': 'License Expired', 'message': f"Safety Lock: {d.name}'s license expired {abs(days)} days ago.", 'type': 'error', 'timestamp': str(datetime.now())})
-                elif days <= 30:
-                    alerts.append({'id': f'd_exp_warn_{d.id}', 'title': 'License Expiring', 'message': f"{d.name}'s license expires in {days} days.", 'type': 'warning', 'timestamp': str(datetime.now())})
-                    
-        # Trips
-        trips = request.env['fleetflow.trip'].sudo().search([('state', 'in', ['Draft', 'Dispatched'])])
-        now = datetime.now()
-        for t in trips:
-            if t.planned_start_date:
-                if t.planned_start_date < now:
-                    alerts.append({'id': f't_delay_{t.id}', 'title': 'Trip Delayed', 'message': f"Trip {t.name} from {t.source} is behind schedule.", 'type': 'error', 'timestamp': str(datetime.now())})
-                    
+        alerts.extend(request.env['fleetflow.event'].sudo()._latest(15))
+        alerts.extend(request.env['fleetflow.alert'].sudo().search([])._to_dict())
         return self._response(alerts)
 
     @http.route('/api/drivers', type='http', auth='public', methods=['GET'], cors='*', csrf=False)
-    def get_drivers(self):
+    def get_drivers(self, **kw):
         if not self._auth_check(): return self._response({'error': 'Unauthorized'}, 401)
         if not self._has_role('dispatcher', 'safety', 'finance'): return self._response({'error': 'Forbidden'}, 403)
-        records = request.env['fleetflow.driver'].sudo().search([])
-        res = []
-        for r in records:
-            res.append({
-                'id': r.id,
-                'name': r.name,
-                'license_number': r.license_number,
-                'license_expiry_date': str(r.license_expiry_date),
-                'status': r.status,
-                'safety_score': r.safety_score,
-                'completion_rate': r.completion_rate
-            })
-        return self._response(res)
-    
+        return self._list_response('drivers', kw)
+
+    @http.route('/api/batch', type='http', auth='public', methods=['POST'], cors='*', csrf=False)
+    def batch_read(self):
+        if not self._auth_check(): return self._response({'error': 'Unauthorized'}, 401)
+        if not self._has_role('dispatcher', 'safety', 'finance'): return self._response({'error': 'Forbidden'}, 403)
+        params = json.loads(request.httprequest.data)
+        # All reads share the request cursor, i.e. one REPEATABLE READ snapshot.
+        results = []
+        for entry in params.get('requests', []):
+            resource = entry.get('resource')
+            if resource not in LIST_RESOURCES:
+                results.append({'resource': resource, 'status': 404, 'error': 'Unknown resource'})
+                continue
+            try:
+                records, next_cursor = self._read_resource(resource, entry, entry.get('filters'), entry.get('fields'))
+            except ValueError as e:
+                results.append({'resource': resource, 'status': 400, 'error': str(e)})
+                continue
+            data = {'records': records, 'next_cursor': next_cursor} if entry.get('limit') else records
+            results.append({'resource': resource, 'status': 200, 'data': data})
+        return self._response({'results': results})
+
     @http.route('/api/drivers/action', type='http', auth='public', methods=['POST'], cors='*', csrf=False)
     def update_driver(self):
         if not self._auth_check(): return self._response({'error': 'Unauthorized'}, 401)
@@ -362,14 +553,10 @@ class FleetFlowAPI(http.Controller):
         return self._response({'error': 'Not found'}, 404)
 
     @http.route('/api/maintenance', type='http', auth='public', methods=['GET'], cors='*', csrf=False)
-    def get_maintenance(self):
+    def get_maintenance(self, **kw):
         if not self._auth_check(): return self._response({'error': 'Unauthorized'}, 401)
         if not self._has_role('dispatcher', 'safety', 'finance'): return self._response({'error': 'Forbidden'}, 403)
-        logs = request.env['fleetflow.maintenance_log'].sudo().search_read([], ['id', 'vehicle_id', 'date', 'service_type', 'cost', 'state'])
-        for l in logs:
-            l['vehicle_name'] = l['vehicle_id'][1] if l['vehicle_id'] else ''
-            if l.get('date'): l['date'] = str(l['date'])
-        return self._response(logs)
+        return self._list_response('maintenance', kw)
 
     @http.route('/api/maintenance/new', type='http', auth='public', methods=['POST'], cors='*', csrf=False)
     def create_maintenance(self):
@@ -382,27 +569,32 @@ class FleetFlowAPI(http.Controller):
         except Exception as e:
             return self._response({'error': str(e)}, 400)
 
+    @http.route('/api/maintenance/bulk', type='http', auth='public', methods=['POST'], cors='*', csrf=False)
+    def bulk_maintenance(self):
+        if not self._auth_check(): return self._response({'error': 'Unauthorized'}, 401)
+        if not self._has_role('finance', 'manager'): return self._response({'error': 'Forbidden'}, 403)
+        return self._bulk_import('fleetflow.maintenance_log')
+
     @http.route('/api/maintenance/action', type='http', auth='public', methods=['POST'], cors='*', csrf=False)
     def update_maintenance(self):
         if not self._auth_check(): return self._response({'error': 'Unauthorized'}, 401)
         if not self._has_role('finance', 'manager'): return self._response({'error': 'Forbidden'}, 403)
         params = json.loads(request.httprequest.data)
-        log_id = params.get('log_id')
-        log = request.env['fleetflow.maintenance_log'].sudo().browse(log_id)
-        if log:
-            log.action_done()
-            return self._response({'status': 'ok'})
+        log_ids = params.get('log_ids') or ([params['log_id']] if params.get('log_id') else [])
+        try:
+            logs = request.env['fleetflow.maintenance_log'].sudo().browse([int(lid) for lid in log_ids]).exists()
+        except (TypeError, ValueError):
+            return self._response({'error': 'log_ids must be a list of ids'}, 400)
+        if logs:
+            logs.action_done()
+            return self._response({'status': 'ok', 'done': logs.ids, 'missing': sorted(set(map(int, log_ids)) - set(logs.ids))})
         return self._response({'error': 'Not found'}, 404)
 
     @http.route('/api/fuel', type='http', auth='public', methods=['GET'], cors='*', csrf=False)
-    def get_fuel(self):
+    def get_fuel(self, **kw):
         if not self._auth_check(): return self._response({'error': 'Unauthorized'}, 401)
         if not self._has_role('dispatcher', 'safety', 'finance'): return self._response({'error': 'Forbidden'}, 403)
-        logs = request.env['fleetflow.fuel_log'].sudo().search_read([], ['id', 'vehicle_id', 'date', 'liters', 'cost', 'odometer_at_fill'])
-        for l in logs:
-            l['vehicle_name'] = l['vehicle_id'][1] if l['vehicle_id'] else ''
-            if l.get('date'): l['date'] = str(l['date'])
-        return self._response(logs)
+        return self._list_response('fuel', kw)
 
     @http.route('/api/fuel/new', type='http', auth='public', methods=['POST'], cors='*', csrf=False)
     def create_fuel(self):
@@ -415,32 +607,56 @@ class FleetFlowAPI(http.Controller):
         except Exception as e:
             return self._response({'error': str(e)}, 400)
 
-    @http.route('/api/analytics', type='http', auth='public', methods=['GET'], cors='*', csrf=False)
-    def get_analytics(self):
+    @http.route('/api/fuel/bulk', type='http', auth='public', methods=['POST'], cors='*', csrf=False)
+    def bulk_fuel(self):
         if not self._auth_check(): return self._response({'error': 'Unauthorized'}, 401)
         if not self._has_role('finance'): return self._response({'error': 'Forbidden'}, 403)
-        v_env = request.env['fleetflow.vehicle'].sudo()
-        vehicles = v_env.search([])
-        res = []
-        total_revenue = sum(request.env['fleetflow.trip'].sudo().search([]).mapped('revenue'))
-        total_fuel_cost = sum(vehicles.mapped('total_fuel_cost'))
-        total_maintenance_cost = sum(vehicles.mapped('total_maintenance_cost'))
-        for v in vehicles:
-            res.append({
-                'id': v.id,
-                'name': v.name,
-                'license_plate': v.license_plate,
-                'status': v.status,
-                'acquisition_cost': v.acquisition_cost,
-                'total_operational_cost': v.total_operational_cost,
-                'total_fuel_cost': v.total_fuel_cost,
-                'total_maintenance_cost': v.total_maintenance_cost,
-                'fuel_efficiency': v.fuel_efficiency,
-                'vehicle_revenue': sum(v.trip_ids.mapped('revenue'))
-            })
+        return self._bulk_import('fleetflow.fuel_log')
+
+    @http.route('/api/fuel/efficiency', type='http', auth='public', methods=['GET'], cors='*', csrf=False)
+    def get_fuel_efficiency(self, **kw):
+        if not self._auth_check(): return self._response({'error': 'Unauthorized'}, 401)
+        if not self._has_role('dispatcher', 'finance'): return self._response({'error': 'Forbidden'}, 403)
+        try:
+            vehicle = request.env['fleetflow.vehicle'].sudo().browse(int(kw.get('vehicle_id') or 0)).exists()
+            date_from = fields.Date.to_date(kw.get('date_from') or None)
+            date_to = fields.Date.to_date(kw.get('date_to') or None)
+        except ValueError as e:
+            return self._response({'error': str(e)}, 400)
+        if not vehicle:
+            return self._response({'error': 'Unknown vehicle_id'}, 404)
         return self._response({
-            'total_revenue': total_revenue,
-            'total_fuel_cost': total_fuel_cost,
-            'total_maintenance_cost': total_maintenance_cost,
-            'vehicle_stats': res
+            'vehicle_id': vehicle.id,
+            'fuel_efficiency': vehicle.fuel_efficiency,
+            'efficiency_30d': vehicle.efficiency_30d,
+            'efficiency_90d': vehicle.efficiency_90d,
+            'efficiency_365d': vehicle.efficiency_365d,
+            'trend': request.env['fleetflow.fuel_bucket'].sudo().efficiency_trend(vehicle.id, date_from, date_to),
         })
+
+    @http.route('/api/analytics', type='http', auth='public', methods=['GET'], cors='*', csrf=False)
+    def get_analytics(self, **kw):
+        if not self._auth_check(): return self._response({'error': 'Unauthorized'}, 401)
+        if not self._has_role('finance'): return self._response({'error': 'Forbidden'}, 403)
+        try:
+            date_from = fields.Date.to_date(kw.get('date_from') or None)
+            date_to = fields.Date.to_date(kw.get('date_to') or None)
+            data = request.env['fleetflow.analytics'].sudo().get_fleet_analytics(date_from, date_to, kw.get('group_by') or None)
+        except (ValueError, UserError) as e:
+            return self._response({'error': 'Invalid analytics parameters', 'details': str(e)}, 400)
+        return self._response(data)
+
+    @http.route('/api/analytics/monthly', type='http', auth='public', methods=['GET'], cors='*', csrf=False)
+    def get_monthly_stats(self, **kw):
+        if not self._auth_check(): return self._response({'error': 'Unauthorized'}, 401)
+        if not self._has_role('finance'): return self._response({'error': 'Forbidden'}, 403)
+        group_by = kw.get('group_by') or 'month'
+        try:
+            date_from = fields.Date.to_date(kw.get('date_from') or None)
+            date_to = fields.Date.to_date(kw.get('date_to') or None)
+            vehicle_ids = [int(vid) for vid in (kw.get('vehicle_ids') or kw.get('vehicle_id') or '').split(',') if vid]
+            rows = request.env['fleetflow.vehicle_month_stats'].sudo().get_stats(
+                group_by, vehicle_ids, kw.get('vehicle_type') or None, kw.get('region') or None, date_from, date_to)
+        except (ValueError, UserError) as e:
+            return self._response({'error': 'Invalid analytics parameters', 'details': str(e)}, 400)
+        return self._response({'group_by': group_by, 'groups': rows})
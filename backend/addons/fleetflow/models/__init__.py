@@ -1,5 +1,18 @@
+from . import event_mixin
+from . import collection_version
+from . import maintenance_risk
 from . import vehicle
 from . import driver
+from . import route
 from . import trip
 from . import maintenance
 from . import fuel
+from . import fuel_bucket
+from . import history
+from . import vehicle_month_stats
+from . import analytics
+from . import optimizer
+from . import alert
+from . import event_ring
+from . import res_users
+from . import ir_websocket
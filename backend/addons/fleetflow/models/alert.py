@@ -0,0 +1,126 @@
+from odoo import models, fields, api
+from odoo.tools import create_index
+
+class Alert(models.Model):
+    _name = 'fleetflow.alert'
+    _inherit = ['fleetflow.event.mixin']
+    _description = 'Fleet Alert'
+    _order = 'raised_at desc, id desc'
+
+    key = fields.Char(required=True)
+    title = fields.Char(required=True)
+    message = fields.Char(required=True)
+    type = fields.Selection([
+        ('info', 'Info'),
+        ('warning', 'Warning'),
+        ('error', 'Error')
+    ], default='info', required=True)
+    res_model = fields.Char()
+    res_id = fields.Integer()
+    active = fields.Boolean(default=True)
+    raised_at = fields.Datetime(default=fields.Datetime.now, required=True)
+    resolved_at = fields.Datetime()
+
+    _sql_constraints = [
+        ('unique_key', 'unique(key)', 'Alert key must be unique!')
+    ]
+
+    def init(self):
+        create_index(self._cr, 'fleetflow_alert_active_raised_at_idx', self._table, ['raised_at DESC', 'id DESC'], where='active')
+
+    @api.model
+    def _sync(self, scope_keys, wanted):
+        # wanted maps alert keys to vals; scope keys that are no longer wanted get resolved.
+        scope_keys = set(scope_keys) | set(wanted)
+        if not scope_keys:
+            return
+        existing = self.with_context(active_test=False).search([('key', 'in', list(scope_keys))])
+        by_key = {a.key: a for a in existing}
+        now = fields.Datetime.now()
+        to_create = []
+        for key, vals in wanted.items():
+            alert = by_key.get(key)
+            if not alert:
+                to_create.append(dict(vals, key=key, raised_at=now))
+            elif not alert.active:
+                alert.write(dict(vals, active=True, raised_at=now, resolved_at=False))
+            elif any(alert[f] != v for f, v in vals.items()):
+                alert.write(vals)
+        to_resolve = existing.filtered(lambda a: a.active and a.key not in wanted)
+        if to_resolve:
+            to_resolve.write({'active': False, 'resolved_at': now})
+        if to_create:
+            self._upsert(to_create)
+
+    @api.model
+    def _upsert(self, vals_list):
+        # The cron and request-time syncs can raise the same key concurrently: the later insert waits
+        # for the first one and takes its row over instead of failing on unique(key).
+        self.flush_model()
+        now = fields.Datetime.now()
+        self.env.cr.execute("""
+            INSERT INTO fleetflow_alert AS a (key, title, message, type, res_model, res_id, active, raised_at,
+                                              create_uid, create_date, write_uid, write_date)
+                 SELECT v.key, v.title, v.message, v.type, v.res_model, v.res_id, TRUE, %(now)s,
+                        %(uid)s, %(now)s, %(uid)s, %(now)s
+                   FROM unnest(%(keys)s::varchar[], %(titles)s::varchar[], %(messages)s::varchar[],
+                               %(types)s::varchar[], %(models)s::varchar[], %(res_ids)s::int[])
+                        AS v(key, title, message, type, res_model, res_id)
+            ON CONFLICT (key) DO UPDATE
+                    SET title = EXCLUDED.title, message = EXCLUDED.message, type = EXCLUDED.type,
+                        res_model = EXCLUDED.res_model, res_id = EXCLUDED.res_id,
+                        raised_at = CASE WHEN a.active THEN a.raised_at ELSE EXCLUDED.raised_at END,
+                        active = TRUE, resolved_at = NULL,
+                        write_uid = EXCLUDED.write_uid, write_date = EXCLUDED.write_date
+              RETURNING a.id, a.xmax = 0
+        """, {
+            'now': now,
+            'uid': self.env.uid,
+            'keys': [v['key'] for v in vals_list],
+            'titles': [v['title'] for v in vals_list],
+            'messages': [v['message'] for v in vals_list],
+            'types': [v.get('type', 'info') for v in vals_list],
+            'models': [v.get('res_model') for v in vals_list],
+            'res_ids': [v.get('res_id') for v in vals_list],
+        })
+        rows = self.env.cr.fetchall()
+        self.invalidate_model()
+        self.browse([rid for rid, inserted in rows if inserted])._queue_change('create')
+        self.browse([rid for rid, inserted in rows if not inserted])._queue_change('write')
+        return self.browse([rid for rid, _inserted in rows])
+
+    @api.model
+    def _alert_vals(self, record, title, message, alert_type):
+        return {'title': title, 'message': message, 'type': alert_type, 'res_model': record._name, 'res_id': record.id}
+
+    @api.model
+    def _rebuild_all(self):
+        self.env['fleetflow.vehicle'].search([])._sync_alerts()
+        self.env['fleetflow.driver'].search([])._sync_alerts()
+        self.env['fleetflow.trip'].search([('state', 'in', ['Draft', 'Dispatched'])])._sync_alerts()
+
+    @api.model
+    def _cron_refresh_time_alerts(self):
+        # License countdowns and trip delays change with the clock, not with writes.
+        today = fields.Date.today()
+        active_keys = self.search([('res_model', 'in', ['fleetflow.driver', 'fleetflow.trip'])])
+        driver_ids = set(active_keys.filtered(lambda a: a.res_model == 'fleetflow.driver').mapped('res_id'))
+        trip_ids = set(active_keys.filtered(lambda a: a.res_model == 'fleetflow.trip').mapped('res_id'))
+        drivers = self.env['fleetflow.driver'].search([('license_expiry_date', '<=', fields.Date.add(today, days=30))])
+        drivers |= self.env['fleetflow.driver'].browse(driver_ids).exists()
+        drivers._sync_alerts()
+        trips = self.env['fleetflow.trip'].search([
+            ('state', 'in', ['Draft', 'Dispatched']),
+            ('planned_start_date', '<', fields.Datetime.now())
+        ])
+        trips |= self.env['fleetflow.trip'].browse(trip_ids).exists()
+        trips._sync_alerts()
+
+    def _to_dict(self):
+        return [{
+            'id': a.key,
+            'title': a.title,
+            'message': a.message,
+            'type': a.type,
+            'timestamp': str(a.raised_at)
+        } for a in self]
@@ -0,0 +1,220 @@
+import time
+from datetime import timedelta
+from odoo import models, api
+from odoo.exceptions import UserError
+
+# (dbname, region, vehicle_type, status) -> (expiry, kpis); other workers converge within the TTL.
+_KPI_CACHE = {}
+KPI_CACHE_TTL = 10
+
+
+def invalidate_dashboard_cache(env):
+    dbname = env.cr.dbname
+    def _clear():
+        for key in [k for k in _KPI_CACHE if k[0] == dbname]:
+            _KPI_CACHE.pop(key, None)
+    _clear()
+    # Clear again after commit, in case a concurrent read cached the pre-commit snapshot.
+    if not env.cr.postcommit.data.get('fleetflow.kpi_cache'):
+        env.cr.postcommit.data['fleetflow.kpi_cache'] = True
+        env.cr.postcommit.add(_clear)
+
+GROUP_COLUMNS = {
+    'vehicle_type': 'v.vehicle_type',
+    'region': 'v.region',
+}
+
+class FleetAnalytics(models.AbstractModel):
+    _name = 'fleetflow.analytics'
+    _description = 'Fleet Analytics'
+
+    def _period_filter(self, column, date_from, date_to, params):
+        clauses = []
+        if date_from:
+            clauses.append(f"{column} >= %s")
+            params.append(date_from)
+        if date_to:
+            clauses.append(f"{column} < %s")
+            params.append(date_to + timedelta(days=1))
+        return ('WHERE ' + ' AND '.join(clauses)) if clauses else ''
+
+    def _month_filter(self, date_from, date_to, params):
+        # Archived history is only kept per month: a month counts if it overlaps the period.
+        clauses = []
+        if date_from:
+            clauses.append("month >= date_trunc('month', %s::date)")
+            params.append(date_from)
+        if date_to:
+            clauses.append("month <= %s")
+            params.append(date_to)
+        return ('WHERE ' + ' AND '.join(clauses)) if clauses else ''
+
+    def _vehicle_totals_cte(self, date_from, date_to):
+        params = []
+        trip_where = self._period_filter('planned_start_date', date_from, date_to, params)
+        fuel_where = self._period_filter('date', date_from, date_to, params)
+        fuel_history_where = self._month_filter(date_from, date_to, params)
+        maint_where = self._period_filter('date', date_from, date_to, params)
+        maint_history_where = self._month_filter(date_from, date_to, params)
+        sql = f"""
+            WITH trip_totals AS (
+                SELECT vehicle_id, SUM(revenue) AS revenue FROM fleetflow_trip {trip_where} GROUP BY vehicle_id
+            ), fuel_totals AS (
+                SELECT vehicle_id, SUM(cost) AS cost
+                  FROM (
+                        SELECT vehicle_id, cost FROM fleetflow_fuel_log {fuel_where}
+                     UNION ALL
+                        SELECT vehicle_id, fuel_cost FROM fleetflow_history_month {fuel_history_where}
+                  ) f
+              GROUP BY vehicle_id
+            ), maintenance_totals AS (
+                SELECT vehicle_id, SUM(cost) AS cost
+                  FROM (
+                        SELECT vehicle_id, cost FROM fleetflow_maintenance_log {maint_where}
+                     UNION ALL
+                        SELECT vehicle_id, maintenance_cost FROM fleetflow_history_month {maint_history_where}
+                  ) m
+              GROUP BY vehicle_id
+            ), vehicle_totals AS (
+                SELECT v.id AS vehicle_id,
+                       COALESCE(t.revenue, 0) AS revenue,
+                       COALESCE(f.cost, 0) AS fuel_cost,
+                       COALESCE(m.cost, 0) AS maintenance_cost
+                  FROM fleetflow_vehicle v
+             LEFT JOIN trip_totals t ON t.vehicle_id = v.id
+             LEFT JOIN fuel_totals f ON f.vehicle_id = v.id
+             LEFT JOIN maintenance_totals m ON m.vehicle_id = v.id
+            )
+        """
+        return sql, params
+
+    @api.model
+    def get_fleet_analytics(self, date_from=None, date_to=None, group_by=None):
+        if group_by and group_by not in GROUP_COLUMNS and group_by != 'month':
+            raise UserError(f"Unsupported group_by: {group_by}")
+        cr = self.env.cr
+        self.env.flush_all()
+
+        cte, params = self._vehicle_totals_cte(date_from, date_to)
+        cr.execute(cte + """
+            SELECT v.id, v.name, v.license_plate, v.status, v.acquisition_cost, v.fuel_efficiency,
+                   v.efficiency_30d, v.efficiency_90d, v.efficiency_365d,
+                   vt.revenue, vt.fuel_cost, vt.maintenance_cost
+              FROM fleetflow_vehicle v
+              JOIN vehicle_totals vt ON vt.vehicle_id = v.id
+          ORDER BY v.id
+        """, params)
+        vehicle_stats = []
+        total_revenue = total_fuel_cost = total_maintenance_cost = 0.0
+        for vid, name, plate, status, acquisition_cost, efficiency, eff_30d, eff_90d, eff_365d, revenue, fuel_cost, maintenance_cost in cr.fetchall():
+            total_revenue += revenue
+            total_fuel_cost += fuel_cost
+            total_maintenance_cost += maintenance_cost
+            vehicle_stats.append({
+                'id': vid,
+                'name': name,
+                'license_plate': plate,
+                'status': status,
+                'acquisition_cost': acquisition_cost or 0.0,
+                'total_operational_cost': fuel_cost + maintenance_cost,
+                'total_fuel_cost': fuel_cost,
+                'total_maintenance_cost': maintenance_cost,
+                'fuel_efficiency': efficiency or 0.0,
+                'efficiency_30d': eff_30d or 0.0,
+                'efficiency_90d': eff_90d or 0.0,
+                'efficiency_365d': eff_365d or 0.0,
+                'vehicle_revenue': revenue,
+            })
+
+        res = {
+            'total_revenue': total_revenue,
+            'total_fuel_cost': total_fuel_cost,
+            'total_maintenance_cost': total_maintenance_cost,
+            'vehicle_stats': vehicle_stats,
+        }
+        if group_by:
+            res['group_by'] = group_by
+            res['groups'] = self._grouped_totals(group_by, date_from, date_to)
+        return res
+
+    def _grouped_totals(self, group_by, date_from, date_to):
+        cr = self.env.cr
+        if group_by == 'month':
+            params = []
+            trip_where = self._period_filter('planned_start_date', date_from, date_to, params)
+            fuel_where = self._period_filter('date', date_from, date_to, params)
+            maint_where = self._period_filter('date', date_from, date_to, params)
+            history_where = self._month_filter(date_from, date_to, params)
+            cr.execute(f"""
+                SELECT to_char(month, 'YYYY-MM'), SUM(revenue), SUM(fuel_cost), SUM(maintenance_cost), COUNT(DISTINCT vehicle_id)
+                  FROM (
+                        SELECT date_trunc('month', planned_start_date)::date AS month, vehicle_id, revenue, 0.0 AS fuel_cost, 0.0 AS maintenance_cost
+                          FROM fleetflow_trip {trip_where}
+                     UNION ALL
+                        SELECT date_trunc('month', date)::date, vehicle_id, 0.0, cost, 0.0 FROM fleetflow_fuel_log {fuel_where}
+                     UNION ALL
+                        SELECT date_trunc('month', date)::date, vehicle_id, 0.0, 0.0, cost FROM fleetflow_maintenance_log {maint_where}
+                     UNION ALL
+                        SELECT month, vehicle_id, 0.0, fuel_cost, maintenance_cost FROM fleetflow_history_month {history_where}
+                  ) facts
+              GROUP BY month
+              ORDER BY month
+            """, params)
+        else:
+            cte, params = self._vehicle_totals_cte(date_from, date_to)
+            cr.execute(cte + f"""
+                SELECT {GROUP_COLUMNS[group_by]}, SUM(vt.revenue), SUM(vt.fuel_cost), SUM(vt.maintenance_cost), COUNT(*)
+                  FROM fleetflow_vehicle v
+                  JOIN vehicle_totals vt ON vt.vehicle_id = v.id
+              GROUP BY 1
+              ORDER BY 1
+            """, params)
+        return [{
+            'key': key,
+            'revenue': revenue,
+            'fuel_cost': fuel_cost,
+            'maintenance_cost': maintenance_cost,
+            'operational_cost': fuel_cost + maintenance_cost,
+            'vehicle_count': vehicle_count,
+        } for key, revenue, fuel_cost, maintenance_cost, vehicle_count in cr.fetchall()]
+
+    @api.model
+    def get_dashboard_kpis(self, region=None, vehicle_type=None, status=None):
+        # Only known selection values reach the cache key, so clients cannot grow it at will.
+        Vehicle = self.env['fleetflow.vehicle']
+        for name, value in (('vehicle_type', vehicle_type), ('status', status)):
+            if value and value not in dict(Vehicle._fields[name].selection):
+                raise UserError(f"Unsupported {name}: {value}")
+        key = (self.env.cr.dbname, region, vehicle_type, status)
+        cached = _KPI_CACHE.get(key)
+        if cached and cached[0] > time.monotonic():
+            return dict(cached[1])
+
+        self.env.flush_all()
+        clauses, values = [], []
+        for column, value in (('region', region), ('vehicle_type', vehicle_type), ('status', status)):
+            if value:
+                clauses.append(f"{{alias}}.{column} = %s")
+                values.append(value)
+        vehicle_where = ''.join(f" AND {c}" for c in clauses)
+        self.env.cr.execute(f"""
+            SELECT COUNT(*),
+                   COUNT(*) FILTER (WHERE v.status = 'On Trip'),
+                   COUNT(*) FILTER (WHERE v.status = 'In Shop'),
+                   (SELECT COUNT(*)
+                      FROM fleetflow_trip t
+                      JOIN fleetflow_vehicle tv ON tv.id = t.vehicle_id
+                     WHERE t.state = 'Draft' {vehicle_where.format(alias='tv')})
+              FROM fleetflow_vehicle v
+             WHERE TRUE {vehicle_where.format(alias='v')}
+        """, values + values)
+        total, active_fleet, in_shop, pending_trips = self.env.cr.fetchone()
+        kpis = {
+            'active_fleet': active_fleet,
+            'maintenance_alerts': in_shop,
+            'utilization_rate': (active_fleet / total * 100) if total > 0 else 0,
+            'pending_trips': pending_trips,
+            'total_vehicles': total
+        }
+        _KPI_CACHE[key] = (time.monotonic() + KPI_CACHE_TTL, kpis)
+        return dict(kpis)
@@ -0,0 +1,48 @@
+import logging
+from functools import partial
+
+from odoo import models, fields, api
+
+_logger = logging.getLogger(__name__)
+
+
+def _bump_versions(registry, names):
+    # Runs after commit in its own short transaction: writers never queue on the counter rows,
+    # and a reader can only see a new version together with the data that caused it.
+    try:
+        with registry.cursor() as cr:
+            cr.execute("""
+                INSERT INTO fleetflow_collection_version (name, version)
+                     SELECT unnest(%s::varchar[]), 1
+                ON CONFLICT (name) DO UPDATE
+                        SET version = fleetflow_collection_version.version + 1
+            """, (sorted(names),))
+    except Exception:
+        _logger.exception("Failed to bump FleetFlow collection versions")
+
+
+class CollectionVersion(models.Model):
+    _name = 'fleetflow.collection_version'
+    _description = 'List Endpoint Change Counter'
+    _log_access = False
+
+    name = fields.Char(required=True, readonly=True)
+    version = fields.Integer(default=0, readonly=True)
+
+    _sql_constraints = [
+        ('unique_name', 'unique(name)', 'One change counter per model!')
+    ]
+
+    @api.model
+    def _bump(self, *model_names):
+        names = self.env.cr.postcommit.data.get('fleetflow.collection_versions')
+        if names is None:
+            names = self.env.cr.postcommit.data['fleetflow.collection_versions'] = set()
+            self.env.cr.postcommit.add(partial(_bump_versions, self.env.registry, names))
+        names.update(model_names)
+
+    @api.model
+    def _versions(self, model_names):
+        self.env.cr.execute("SELECT name, version FROM fleetflow_collection_version WHERE name = ANY(%s)", (list(model_names),))
+        versions = dict(self.env.cr.fetchall())
+        return [versions.get(name, 0) for name in model_names]
@@ -1,13 +1,16 @@
 from odoo import models, fields, api
 from datetime import date
 
+ALERT_FIELDS = {'license_expiry_date', 'name'}
+
 class Driver(models.Model):
     _name = 'fleetflow.driver'
+    _inherit = ['fleetflow.event.mixin']
     _description = 'Fleet Driver'
 
     name = fields.Char(required=True)
     license_number = fields.Char(required=True)
-    license_expiry_date = fields.Date(required=True)
+    license_expiry_date = fields.Date(required=True, index=True)
     status = fields.Selection([
         ('On Duty', 'On Duty'),
         ('Off Duty', 'Off Duty'),
@@ -17,11 +20,86 @@ class Driver(models.Model):
     safety_score = fields.Integer(default=100)
     
     trip_ids = fields.One2many('fleetflow.trip', 'driver_id')
+    # Counters maintained by trip create/write/unlink, see _apply_trip_deltas().
+    trip_count = fields.Integer(default=0, readonly=True)
+    completed_trip_count = fields.Integer(default=0, readonly=True)
     completion_rate = fields.Float(compute='_compute_completion', store=True)
 
-    @api.depends('trip_ids.state')
+    @api.depends('trip_count', 'completed_trip_count')
     def _compute_completion(self):
         for rec in self:
-            completed_trips = len(rec.trip_ids.filtered(lambda t: t.state == 'Completed'))
-            total_trips = len(rec.trip_ids)
-            rec.completion_rate = (completed_trips / total_trips * 100) if total_trips > 0 else 100
+            rec.completion_rate = (rec.completed_trip_count / rec.trip_count * 100) if rec.trip_count > 0 else 100
+
+    @api.model
+    def _apply_trip_deltas(self, deltas):
+        deltas = {did: d for did, d in deltas.items() if did and (d[0] or d[1])}
+        if not deltas:
+            return
+        self.flush_model(['trip_count', 'completed_trip_count', 'completion_rate'])
+        self.env.cr.execute("""
+            UPDATE fleetflow_driver dr
+               SET trip_count = c.trip_count,
+                   completed_trip_count = c.completed_trip_count,
+                   completion_rate = CASE WHEN c.trip_count > 0 THEN c.completed_trip_count * 100.0 / c.trip_count ELSE 100 END
+              FROM (
+                    SELECT d.id,
+                           COALESCE(d.trip_count, 0) + x.total AS trip_count,
+                           COALESCE(d.completed_trip_count, 0) + x.completed AS completed_trip_count
+                      FROM fleetflow_driver d
+                      JOIN (SELECT unnest(%s::int[]) AS id, unnest(%s::int[]) AS total, unnest(%s::int[]) AS completed) x ON x.id = d.id
+              ) c
+             WHERE c.id = dr.id
+        """, (list(deltas), [d[0] for d in deltas.values()], [d[1] for d in deltas.values()]))
+        self.invalidate_model(['trip_count', 'completed_trip_count', 'completion_rate'])
+        self.env['fleetflow.collection_version']._bump(self._name)
+
+    @api.model
+    def _rebuild_trip_counters(self):
+        self.env.flush_all()
+        self.env.cr.execute("""
+            UPDATE fleetflow_driver dr
+               SET trip_count = COALESCE(c.total, 0),
+                   completed_trip_count = COALESCE(c.completed, 0),
+                   completion_rate = CASE WHEN COALESCE(c.total, 0) > 0 THEN c.completed * 100.0 / c.total ELSE 100 END
+              FROM fleetflow_driver d
+         LEFT JOIN (
+                    SELECT driver_id, COUNT(*) AS total, COUNT(*) FILTER (WHERE state = 'Completed') AS completed
+                      FROM fleetflow_trip
+                  GROUP BY driver_id
+              ) c ON c.driver_id = d.id
+             WHERE d.id = dr.id
+        """)
+        self.invalidate_model(['trip_count', 'completed_trip_count', 'completion_rate'])
+        self.env['fleetflow.collection_version']._bump(self._name)
+
+    @api.model_create_multi
+    def create(self, vals_list):
+        records = super().create(vals_list)
+        records._sync_alerts()
+        return records
+
+    def write(self, vals):
+        res = super().write(vals)
+        if ALERT_FIELDS.intersection(vals):
+            self._sync_alerts()
+        return res
+
+    def unlink(self):
+        self.env['fleetflow.alert'].sudo()._sync(self._alert_keys(), {})
+        return super().unlink()
+
+    def _alert_keys(self):
+        return [key for d in self for key in (f'd_exp_{d.id}', f'd_exp_warn_{d.id}')]
+
+    def _sync_alerts(self):
+        alerts = self.env['fleetflow.alert'].sudo()
+        today = date.today()
+        wanted = {}
+        for d in self:
+            if d.license_expiry_date:
+                days = (d.license_expiry_date - today).days
+                if days < 0:
+                    wanted[f'd_exp_{d.id}'] = alerts._alert_vals(d, 'License Expired', f"Safety Lock: {d.name}'s license expired {abs(days)} days ago.", 'error')
+                elif days <= 30:
+                    wanted[f'd_exp_warn_{d.id}'] = alerts._alert_vals(d, 'License Expiring', f"{d.name}'s license expires in {days} days.", 'warning')
+        alerts._sync(self._alert_keys(), wanted)
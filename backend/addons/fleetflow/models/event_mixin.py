@@ -0,0 +1,59 @@
+from odoo import models, api
+
+# Bus channel the frontend subscribes to over Odoo's websocket (see ir_websocket.py).
+EVENT_CHANNEL = 'fleetflow_events'
+EVENT_TYPE = 'fleetflow/event'
+# Larger id sets are sent as "reload everything" to keep bus payloads small.
+MAX_EVENT_IDS = 200
+
+
+class EventMixin(models.AbstractModel):
+    _name = 'fleetflow.event.mixin'
+    _description = 'FleetFlow Change Events'
+
+    @api.model_create_multi
+    def create(self, vals_list):
+        records = super().create(vals_list)
+        records._queue_change('create')
+        return records
+
+    def write(self, vals):
+        res = super().write(vals)
+        self._queue_change('write')
+        return res
+
+    def unlink(self):
+        self._queue_change('unlink')
+        return super().unlink()
+
+    def _pending_events(self):
+        # Kept with the precommit hooks: a flushing savepoint sends what was queued before it
+        # and clears what was queued inside it if it rolls back, so undone records never publish.
+        pending = self.env.cr.precommit.data.get('fleetflow.events')
+        if pending is None:
+            pending = self.env.cr.precommit.data['fleetflow.events'] = {}
+            self.env.cr.precommit.add(self.env['fleetflow.event.mixin']._send_events)
+        return pending
+
+    @api.model
+    def _send_events(self):
+        pending = self.env.cr.precommit.data.pop('fleetflow.events', {})
+        notifications = []
+        for (model, op), ids in pending.get('changes', {}).items():
+            ids = sorted(ids)
+            notifications.append([EVENT_CHANNEL, EVENT_TYPE, {'model': model, 'op': op, 'ids': ids if len(ids) <= MAX_EVENT_IDS else None}])
+        for alert in pending.get('alerts', []):
+            notifications.append([EVENT_CHANNEL, EVENT_TYPE, {'model': 'fleetflow.alert', 'op': 'push', 'alert': alert}])
+        if notifications:
+            # bus.bus rows are part of this transaction and only reach subscribers once it commits.
+            self.env['bus.bus'].sudo()._sendmany(notifications)
+
+    def _queue_change(self, op):
+        if self.ids:
+            self.env['fleetflow.collection_version']._bump(self._name)
+            changes = self._pending_events().setdefault('changes', {})
+            changes.setdefault((self._name, op), set()).update(self.ids)
+
+    @api.model
+    def _push_alert(self, alert):
+        self._pending_events().setdefault('alerts', []).append(alert)
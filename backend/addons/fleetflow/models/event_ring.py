@@ -0,0 +1,74 @@
+from odoo import models, fields, api
+from odoo.tools import create_index
+
+DEFAULT_RING_SIZE = 500
+
+class EventRing(models.Model):
+    _name = 'fleetflow.event'
+    _description = 'Fleet Event Ring'
+    _order = 'seq desc'
+    _log_access = False
+
+    slot = fields.Integer(required=True, readonly=True)
+    seq = fields.Integer(required=True, readonly=True)
+    title = fields.Char(required=True)
+    message = fields.Char(required=True)
+    type = fields.Selection([
+        ('info', 'Info'),
+        ('warning', 'Warning'),
+        ('error', 'Error')
+    ], default='info', required=True)
+    timestamp = fields.Datetime(required=True)
+
+    _sql_constraints = [
+        ('unique_slot', 'unique(slot)', 'Event ring slots must be unique!')
+    ]
+
+    def init(self):
+        self._cr.execute("CREATE SEQUENCE IF NOT EXISTS fleetflow_event_seq")
+        create_index(self._cr, 'fleetflow_event_seq_idx', self._table, ['seq DESC'])
+
+    @api.model
+    def _ring_size(self):
+        return max(1, int(self.env['ir.config_parameter'].sudo().get_param('fleetflow.event_ring_size', DEFAULT_RING_SIZE)))
+
+    @api.model
+    def _record(self, title, message, event_type='info'):
+        # Slots are reused modulo the ring size: an insert overwrites the oldest event instead of growing the table.
+        self.env.cr.execute("""
+            INSERT INTO fleetflow_event (slot, seq, title, message, type, timestamp)
+                 SELECT n.seq %% %s, n.seq, %s, %s, %s, now() at time zone 'UTC'
+                   FROM (SELECT nextval('fleetflow_event_seq') AS seq) n
+            ON CONFLICT (slot) DO UPDATE
+                    SET seq = EXCLUDED.seq, title = EXCLUDED.title, message = EXCLUDED.message,
+                        type = EXCLUDED.type, timestamp = EXCLUDED.timestamp
+              RETURNING seq, timestamp
+        """, (self._ring_size(), title, message, event_type))
+        seq, timestamp = self.env.cr.fetchone()
+        self.invalidate_model()
+        return {'id': f'ev_{seq}', 'title': title, 'message': message, 'type': event_type, 'timestamp': str(timestamp)}
+
+    @api.model
+    def _latest(self, limit):
+        size = self._ring_size()
+        params = [size]
+        retention_days = int(self.env['ir.config_parameter'].sudo().get_param('fleetflow.event_retention_days', 0))
+        where = ''
+        if retention_days:
+            where = "AND timestamp >= (now() at time zone 'UTC') - make_interval(days => %s)"
+            params.append(retention_days)
+        params.append(min(limit, size))
+        self.env.cr.execute(f"""
+            SELECT seq, title, message, type, timestamp
+              FROM fleetflow_event
+             WHERE slot < %s {where}
+          ORDER BY seq DESC
+             LIMIT %s
+        """, params)
+        return [{
+            'id': f'ev_{seq}',
+            'title': title,
+            'message': message,
+            'type': event_type,
+            'timestamp': str(timestamp)
+        } for seq, title, message, event_type, timestamp in self.env.cr.fetchall()]
@@ -1,4 +1,15 @@
-from odoo import models, fields
+import math
+from collections import defaultdict
+from odoo import models, fields, api
+from odoo.tools import create_index
+
+from .vehicle_month_stats import add_stat_delta
+
+SEGMENT_FIELDS = {'vehicle_id', 'date', 'liters', 'odometer_at_fill'}
+TOTAL_FIELDS = {'vehicle_id', 'date', 'liters', 'cost'}
+ANOMALY_MIN_SAMPLES = 5
+DEFAULT_ANOMALY_ALPHA = 0.1
+DEFAULT_ANOMALY_Z = 3.0
 
 class FuelLog(models.Model):
     _name = 'fleetflow.fuel_log'
@@ -9,3 +20,202 @@ class FuelLog(models.Model):
     liters = fields.Float(required=True)
     cost = fields.Float(required=True)
     odometer_at_fill = fields.Float(required=True)
+    # Distance since the vehicle's previous fill (by odometer), maintained by _refresh_segments().
+    segment_km = fields.Float(default=0, readonly=True)
+    km_per_liter = fields.Float(default=0, readonly=True)
+    # Scored once on ingest against the vehicle's rolling consumption, see _detect_anomalies().
+    anomaly_score = fields.Float(readonly=True)
+    is_anomaly = fields.Boolean(default=False, readonly=True)
+
+    def init(self):
+        create_index(self._cr, 'fleetflow_fuel_log_vehicle_date_idx', self._table, ['vehicle_id', 'date'])
+        # Previous/next fill lookups in _refresh_segments() and _successors().
+        create_index(self._cr, 'fleetflow_fuel_log_vehicle_odometer_idx', self._table, ['vehicle_id', 'odometer_at_fill', 'id'])
+
+    @api.model_create_multi
+    def create(self, vals_list):
+        records = super().create(vals_list)
+        records._apply_cost(1)
+        (records | records._successors())._refresh_segments()
+        records._detect_anomalies()
+        self.env['fleetflow.collection_version']._bump(self._name)
+        return records
+
+    def write(self, vals):
+        segments = SEGMENT_FIELDS.intersection(vals)
+        if segments:
+            old_successors = self._successors() - self
+            self._clear_segments()
+        if not TOTAL_FIELDS.intersection(vals):
+            res = super().write(vals)
+        else:
+            self._apply_cost(-1)
+            res = super().write(vals)
+            self._apply_cost(1)
+        if segments:
+            (self | old_successors.exists() | self._successors())._refresh_segments()
+        self.env['fleetflow.collection_version']._bump(self._name)
+        return res
+
+    def unlink(self):
+        self._apply_cost(-1)
+        successors = self._successors() - self
+        self._clear_segments()
+        res = super().unlink()
+        successors.exists()._refresh_segments()
+        self.env['fleetflow.collection_version']._bump(self._name)
+        return res
+
+    def _apply_cost(self, sign):
+        deltas = defaultdict(float)
+        stat_deltas = {}
+        for rec in self:
+            deltas[rec.vehicle_id.id] += sign * rec.cost
+            add_stat_delta(stat_deltas, rec.vehicle_id.id, rec.date, fuel_cost=sign * rec.cost, fuel_liters=sign * rec.liters)
+        self.env['fleetflow.vehicle'].sudo()._apply_cost_deltas('total_fuel_cost', deltas)
+        self.env['fleetflow.vehicle_month_stats'].sudo()._apply_deltas(stat_deltas)
+
+    def _successors(self):
+        # The next fill of the same vehicle by (odometer_at_fill, id); its segment starts at one of ours.
+        if not self.ids:
+            return self.browse()
+        self.flush_model(['vehicle_id', 'odometer_at_fill'])
+        self.env.cr.execute("""
+            SELECT DISTINCT n.id
+              FROM fleetflow_fuel_log f
+              JOIN LATERAL (
+                    SELECT id
+                      FROM fleetflow_fuel_log n
+                     WHERE n.vehicle_id = f.vehicle_id
+                       AND (n.odometer_at_fill, n.id) > (f.odometer_at_fill, f.id)
+                  ORDER BY n.odometer_at_fill, n.id
+                     LIMIT 1
+              ) n ON TRUE
+             WHERE f.id = ANY(%s)
+        """, (self.ids,))
+        return self.browse([row[0] for row in self.env.cr.fetchall()])
+
+    def _clear_segments(self):
+        deltas = defaultdict(lambda: [0.0, 0.0])
+        for rec in self:
+            if rec.segment_km > 0:
+                bucket = deltas[(rec.vehicle_id.id, rec.date)]
+                bucket[0] -= rec.segment_km
+                bucket[1] -= rec.liters
+        if self.ids:
+            self.flush_model(['segment_km', 'km_per_liter'])
+            self.env.cr.execute("UPDATE fleetflow_fuel_log SET segment_km = 0, km_per_liter = 0 WHERE id = ANY(%s)", (self.ids,))
+            self.invalidate_recordset(['segment_km', 'km_per_liter'])
+        self.env['fleetflow.fuel_bucket'].sudo()._apply_deltas(deltas)
+
+    def _refresh_segments(self):
+        if not self.ids:
+            return
+        self.flush_model()
+        self.env.cr.execute("""
+            WITH seg AS (
+                SELECT f.id, f.segment_km AS old_segment_km,
+                       GREATEST(COALESCE(f.odometer_at_fill - p.odometer_at_fill, f.odometer_at_fill - h.last_odometer, 0), 0) AS segment_km
+                  FROM fleetflow_fuel_log f
+             LEFT JOIN LATERAL (
+                        SELECT odometer_at_fill
+                          FROM fleetflow_fuel_log p
+                         WHERE p.vehicle_id = f.vehicle_id
+                           AND (p.odometer_at_fill, p.id) < (f.odometer_at_fill, f.id)
+                      ORDER BY p.odometer_at_fill DESC, p.id DESC
+                         LIMIT 1
+                  ) p ON TRUE
+             -- The first hot fill continues from the last archived one.
+             LEFT JOIN LATERAL (
+                        SELECT NULLIF(MAX(last_odometer), 0) AS last_odometer
+                          FROM fleetflow_history_month h
+                         WHERE h.vehicle_id = f.vehicle_id
+                  ) h ON TRUE
+                 WHERE f.id = ANY(%s)
+            )
+            UPDATE fleetflow_fuel_log f
+               SET segment_km = seg.segment_km,
+                   km_per_liter = CASE WHEN seg.segment_km > 0 AND f.liters > 0 THEN seg.segment_km / f.liters ELSE 0 END
+              FROM seg
+             WHERE seg.id = f.id
+         RETURNING f.vehicle_id, f.date, f.liters, seg.old_segment_km, seg.segment_km
+        """, (self.ids,))
+        deltas = defaultdict(lambda: [0.0, 0.0])
+        for vehicle_id, day, liters, old_segment, segment in self.env.cr.fetchall():
+            bucket = deltas[(vehicle_id, day)]
+            if old_segment and old_segment > 0:
+                bucket[0] -= old_segment
+                bucket[1] -= liters
+            if segment > 0:
+                bucket[0] += segment
+                bucket[1] += liters
+        self.invalidate_recordset(['segment_km', 'km_per_liter'])
+        self.env['fleetflow.fuel_bucket'].sudo()._apply_deltas(deltas)
+
+    def _detect_anomalies(self):
+        # O(1) per fill: only the vehicle's EWMA state is read, never its fill history.
+        # NO KEY UPDATE serializes concurrent fills without blocking FK inserts against the vehicles.
+        if not self:
+            return
+        params = self.env['ir.config_parameter'].sudo()
+        alpha = float(params.get_param('fleetflow.fuel_anomaly_alpha', DEFAULT_ANOMALY_ALPHA))
+        threshold = float(params.get_param('fleetflow.fuel_anomaly_z', DEFAULT_ANOMALY_Z))
+        Vehicle = self.env['fleetflow.vehicle'].sudo()
+        Vehicle.flush_model(['fuel_ewma_mean', 'fuel_ewma_var', 'fuel_sample_count', 'fuel_last_odometer'])
+        self.env.cr.execute("""
+            SELECT id, COALESCE(fuel_ewma_mean, 0), COALESCE(fuel_ewma_var, 0), COALESCE(fuel_sample_count, 0), fuel_last_odometer
+              FROM fleetflow_vehicle
+             WHERE id = ANY(%s)
+          ORDER BY id
+               FOR NO KEY UPDATE
+        """, (list(set(self.vehicle_id.ids)),))
+        state = {row[0]: list(row[1:]) for row in self.env.cr.fetchall()}
+        scores, anomalies = {}, []
+        for rec in self.sorted(lambda r: (r.vehicle_id.id, r.odometer_at_fill, r.id)):
+            mean, var, count, last_odometer = state[rec.vehicle_id.id]
+            state[rec.vehicle_id.id][3] = max(rec.odometer_at_fill, last_odometer or 0)
+            if last_odometer is None:
+                continue
+            distance = rec.odometer_at_fill - last_odometer
+            if distance <= 0:
+                # A reading at or below the last fill is a sensor error or a back-dated entry.
+                scores[rec.id] = (None, True)
+                anomalies.append((rec, f"odometer {rec.odometer_at_fill:.0f}km is not past the last fill at {last_odometer:.0f}km"))
+                continue
+            consumption = rec.liters / distance * 100
+            score = (consumption - mean) / math.sqrt(var) if count >= ANOMALY_MIN_SAMPLES and var > 0 else 0.0
+            flagged = abs(score) > threshold
+            scores[rec.id] = (score, flagged)
+            if flagged:
+                anomalies.append((rec, f"{consumption:.1f} L/100km against a rolling {mean:.1f} L/100km (z={score:+.1f})"))
+                continue
+            # Outliers are kept out of the baseline so a burst of bad fills cannot normalise itself.
+            a = max(alpha, 1.0 / (count + 1))
+            diff = consumption - mean
+            mean += a * diff
+            var = (1 - a) * (var + a * diff * diff)
+            state[rec.vehicle_id.id][:3] = [mean, var, count + 1]
+
+        self.env.cr.execute("""
+            UPDATE fleetflow_vehicle v
+               SET fuel_ewma_mean = d.mean, fuel_ewma_var = d.var, fuel_sample_count = d.count, fuel_last_odometer = d.odometer
+              FROM (SELECT unnest(%s::int[]) AS id, unnest(%s::float8[]) AS mean, unnest(%s::float8[]) AS var,
+                           unnest(%s::int[]) AS count, unnest(%s::float8[]) AS odometer) d
+             WHERE v.id = d.id
+        """, (list(state), [s[0] for s in state.values()], [s[1] for s in state.values()],
+              [s[2] for s in state.values()], [s[3] for s in state.values()]))
+        Vehicle.invalidate_model(['fuel_ewma_mean', 'fuel_ewma_var', 'fuel_sample_count', 'fuel_last_odometer'])
+        if scores:
+            self.flush_model(['anomaly_score', 'is_anomaly'])
+            self.env.cr.execute("""
+                UPDATE fleetflow_fuel_log f
+                   SET anomaly_score = d.score, is_anomaly = d.flagged
+                  FROM (SELECT unnest(%s::int[]) AS id, unnest(%s::float8[]) AS score, unnest(%s::bool[]) AS flagged) d
+                 WHERE f.id = d.id
+            """, (list(scores), [s[0] for s in scores.values()], [s[1] for s in scores.values()]))
+            self.invalidate_recordset(['anomaly_score', 'is_anomaly'])
+
+        events = self.env['fleetflow.event'].sudo()
+        for rec, reason in anomalies:
+            alert = events._record('Fuel Anomaly', f"Fill #{rec.id} on {rec.vehicle_id.name} ({rec.vehicle_id.license_plate}): {reason}.", 'warning')
+            self.env['fleetflow.alert']._push_alert(alert)
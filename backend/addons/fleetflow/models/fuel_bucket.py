@@ -0,0 +1,137 @@
+from datetime import timedelta
+from odoo import models, fields, api
+
+ROLLING_WINDOWS = (30, 90, 365)
+
+class FuelBucket(models.Model):
+    _name = 'fleetflow.fuel_bucket'
+    _description = 'Daily Fuel Consumption Bucket'
+    _order = 'vehicle_id, day'
+    _log_access = False
+
+    vehicle_id = fields.Many2one('fleetflow.vehicle', required=True, ondelete='cascade', index=True)
+    day = fields.Date(required=True)
+    distance_km = fields.Float(default=0)
+    liters = fields.Float(default=0)
+
+    _sql_constraints = [
+        ('unique_vehicle_day', 'unique(vehicle_id, day)', 'One fuel bucket per vehicle and day!')
+    ]
+
+    @api.model
+    def _apply_deltas(self, deltas):
+        # deltas: (vehicle_id, day) -> [distance_km, liters]
+        deltas = {key: d for key, d in deltas.items() if d[0] or d[1]}
+        if not deltas:
+            return
+        keys = list(deltas)
+        self.env.cr.execute("""
+            INSERT INTO fleetflow_fuel_bucket (vehicle_id, day, distance_km, liters)
+                 SELECT * FROM unnest(%s::int[], %s::date[], %s::float8[], %s::float8[])
+            ON CONFLICT (vehicle_id, day) DO UPDATE
+                    SET distance_km = fleetflow_fuel_bucket.distance_km + EXCLUDED.distance_km,
+                        liters = fleetflow_fuel_bucket.liters + EXCLUDED.liters
+        """, ([k[0] for k in keys], [k[1] for k in keys], [deltas[k][0] for k in keys], [deltas[k][1] for k in keys]))
+        self.invalidate_model()
+        self._refresh_vehicle_efficiency({k[0] for k in keys})
+
+    @api.model
+    def _refresh_vehicle_efficiency(self, vehicle_ids=None):
+        today = fields.Date.today()
+        windows = ', '.join(
+            f"SUM(b.distance_km) FILTER (WHERE b.day > %(d{n})s) / NULLIF(SUM(b.liters) FILTER (WHERE b.day > %(d{n})s), 0) AS e{n}"
+            for n in ROLLING_WINDOWS
+        )
+        params = {f'd{n}': today - timedelta(days=n) for n in ROLLING_WINDOWS}
+        params['ids'] = list(vehicle_ids) if vehicle_ids is not None else None
+        self.env['fleetflow.vehicle'].flush_model()
+        self.env.cr.execute(f"""
+            UPDATE fleetflow_vehicle v
+               SET fuel_efficiency = COALESCE(e.lifetime, 0),
+                   {', '.join(f'efficiency_{n}d = COALESCE(e.e{n}, 0)' for n in ROLLING_WINDOWS)},
+                   write_date = now() at time zone 'UTC'
+              FROM (
+                    SELECT v2.id, SUM(b.distance_km) / NULLIF(SUM(b.liters), 0) AS lifetime, {windows}
+                      FROM fleetflow_vehicle v2
+                 LEFT JOIN fleetflow_fuel_bucket b ON b.vehicle_id = v2.id
+                     WHERE %(ids)s::int[] IS NULL OR v2.id = ANY(%(ids)s::int[])
+                  GROUP BY v2.id
+              ) e
+             WHERE e.id = v.id
+               AND (v.fuel_efficiency, {', '.join(f'v.efficiency_{n}d' for n in ROLLING_WINDOWS)})
+                   IS DISTINCT FROM (COALESCE(e.lifetime, 0), {', '.join(f'COALESCE(e.e{n}, 0)' for n in ROLLING_WINDOWS)})
+        """, params)
+        changed = self.env.cr.rowcount
+        self.env['fleetflow.vehicle'].invalidate_model(['fuel_efficiency', 'write_date'] + [f'efficiency_{n}d' for n in ROLLING_WINDOWS])
+        if changed:
+            self.env['fleetflow.collection_version']._bump('fleetflow.vehicle')
+
+    @api.model
+    def _cron_refresh_rolling_efficiency(self):
+        # The windows slide every day even when no new fill arrives.
+        self._refresh_vehicle_efficiency()
+
+    @api.model
+    def efficiency_trend(self, vehicle_id, date_from=None, date_to=None):
+        clauses, params = ['vehicle_id = %s'], [vehicle_id]
+        if date_from:
+            clauses.append('day >= %s')
+            params.append(date_from)
+        if date_to:
+            clauses.append('day <= %s')
+            params.append(date_to)
+        self.env.cr.execute(f"""
+            SELECT to_char(date_trunc('month', day), 'YYYY-MM'), SUM(distance_km), SUM(liters)
+              FROM fleetflow_fuel_bucket
+             WHERE {' AND '.join(clauses)}
+          GROUP BY 1
+          ORDER BY 1
+        """, params)
+        return [{
+            'month': month,
+            'distance_km': distance,
+            'liters': liters,
+            'km_per_liter': (distance / liters) if liters else 0
+        } for month, distance, liters in self.env.cr.fetchall()]
+
+    @api.model
+    def _rebuild(self, vehicle_ids=None):
+        self.env.flush_all()
+        # Buckets of archived days are kept as they are: their fills are no longer in the hot table.
+        archived_before = self.env['fleetflow.history_month']._archived_before()
+        params = {'ids': list(vehicle_ids) if vehicle_ids is not None else None, 'archived_before': archived_before}
+        self.env.cr.execute("""
+            UPDATE fleetflow_fuel_log f
+               SET segment_km = s.segment_km,
+                   km_per_liter = CASE WHEN s.segment_km > 0 AND f.liters > 0 THEN s.segment_km / f.liters ELSE 0 END
+              FROM (
+                    SELECT l.id, GREATEST(COALESCE(
+                               l.odometer_at_fill - LAG(l.odometer_at_fill) OVER (PARTITION BY l.vehicle_id ORDER BY l.odometer_at_fill, l.id),
+                               l.odometer_at_fill - h.last_odometer,
+                               0), 0) AS segment_km
+                      FROM fleetflow_fuel_log l
+                 LEFT JOIN (
+                            SELECT vehicle_id, NULLIF(MAX(last_odometer), 0) AS last_odometer
+                              FROM fleetflow_history_month
+                          GROUP BY vehicle_id
+                      ) h ON h.vehicle_id = l.vehicle_id
+                     WHERE %(ids)s::int[] IS NULL OR l.vehicle_id = ANY(%(ids)s::int[])
+              ) s
+             WHERE s.id = f.id
+        """, params)
+        self.env.cr.execute("""
+            DELETE FROM fleetflow_fuel_bucket
+             WHERE (%(ids)s::int[] IS NULL OR vehicle_id = ANY(%(ids)s::int[]))
+               AND (%(archived_before)s::date IS NULL OR day >= %(archived_before)s::date);
+            INSERT INTO fleetflow_fuel_bucket (vehicle_id, day, distance_km, liters)
+                 SELECT vehicle_id, date, SUM(segment_km), SUM(liters)
+                   FROM fleetflow_fuel_log
+                  WHERE segment_km > 0
+                    AND (%(ids)s::int[] IS NULL OR vehicle_id = ANY(%(ids)s::int[]))
+                    AND (%(archived_before)s::date IS NULL OR date >= %(archived_before)s::date)
+               GROUP BY vehicle_id, date;
+        """, params)
+        self.env['fleetflow.fuel_log'].invalidate_model(['segment_km', 'km_per_liter'])
+        self.env['fleetflow.collection_version']._bump('fleetflow.fuel_log')
+        self.invalidate_model()
+        self._refresh_vehicle_efficiency(vehicle_ids)
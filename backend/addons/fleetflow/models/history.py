@@ -0,0 +1,103 @@
+from dateutil.relativedelta import relativedelta
+from odoo import models, fields, api
+
+DEFAULT_HORIZON_MONTHS = 24
+
+class HistoryMonth(models.Model):
+    _name = 'fleetflow.history_month'
+    _description = 'Archived Fleet History (per vehicle and month)'
+    _order = 'vehicle_id, month'
+    _log_access = False
+
+    vehicle_id = fields.Many2one('fleetflow.vehicle', required=True, ondelete='cascade', index=True)
+    month = fields.Date(required=True)
+    fuel_count = fields.Integer(default=0)
+    fuel_liters = fields.Float(default=0)
+    fuel_cost = fields.Float(default=0)
+    fuel_distance_km = fields.Float(default=0)
+    last_odometer = fields.Float(default=0)
+    maintenance_count = fields.Integer(default=0)
+    maintenance_cost = fields.Float(default=0)
+
+    _sql_constraints = [
+        ('unique_vehicle_month', 'unique(vehicle_id, month)', 'One history row per vehicle and month!')
+    ]
+
+    def init(self):
+        # Cold storage: archived rows are kept verbatim as jsonb so later schema changes never break the move.
+        self._cr.execute("""
+            CREATE TABLE IF NOT EXISTS fleetflow_history_archive (
+                id serial PRIMARY KEY,
+                res_model varchar NOT NULL,
+                res_id integer NOT NULL,
+                vehicle_id integer,
+                date date,
+                data jsonb NOT NULL,
+                archived_at timestamp NOT NULL DEFAULT (now() at time zone 'UTC')
+            )
+        """)
+        self._cr.execute("CREATE INDEX IF NOT EXISTS fleetflow_history_archive_vehicle_date_idx ON fleetflow_history_archive (vehicle_id, date)")
+
+    @api.model
+    def _archived_before(self):
+        # Everything dated before this day lives in the monthly rollup, not in the hot tables.
+        value = self.env['ir.config_parameter'].sudo().get_param('fleetflow.history_archived_before')
+        return fields.Date.to_date(value) if value else None
+
+    @api.model
+    def _cron_archive_history(self):
+        horizon = int(self.env['ir.config_parameter'].sudo().get_param('fleetflow.history_horizon_months', DEFAULT_HORIZON_MONTHS))
+        if horizon <= 0:
+            return
+        cutoff = fields.Date.today().replace(day=1) - relativedelta(months=horizon)
+        self.env.flush_all()
+        cr = self.env.cr
+        cr.execute("""
+            WITH moved AS (
+                DELETE FROM fleetflow_fuel_log WHERE date < %(cutoff)s RETURNING *
+            ), archived AS (
+                INSERT INTO fleetflow_history_archive (res_model, res_id, vehicle_id, date, data)
+                     SELECT 'fleetflow.fuel_log', id, vehicle_id, date, to_jsonb(moved) FROM moved
+            ), rolled AS (
+                INSERT INTO fleetflow_history_month (vehicle_id, month, fuel_count, fuel_liters, fuel_cost, fuel_distance_km, last_odometer, maintenance_count, maintenance_cost)
+                     SELECT vehicle_id, date_trunc('month', date)::date, COUNT(*), SUM(liters), SUM(cost),
+                            SUM(GREATEST(COALESCE(segment_km, 0), 0)), MAX(odometer_at_fill), 0, 0
+                       FROM moved
+                   GROUP BY 1, 2
+                ON CONFLICT (vehicle_id, month) DO UPDATE
+                        SET fuel_count = fleetflow_history_month.fuel_count + EXCLUDED.fuel_count,
+                            fuel_liters = fleetflow_history_month.fuel_liters + EXCLUDED.fuel_liters,
+                            fuel_cost = fleetflow_history_month.fuel_cost + EXCLUDED.fuel_cost,
+                            fuel_distance_km = fleetflow_history_month.fuel_distance_km + EXCLUDED.fuel_distance_km,
+                            last_odometer = GREATEST(fleetflow_history_month.last_odometer, EXCLUDED.last_odometer)
+            )
+            SELECT COUNT(*) FROM moved
+        """, {'cutoff': cutoff})
+        fuel_moved = cr.fetchone()[0]
+        # Open jobs still drive vehicle status, so only closed maintenance is archived.
+        cr.execute("""
+            WITH moved AS (
+                DELETE FROM fleetflow_maintenance_log WHERE date < %(cutoff)s AND state = 'Done' RETURNING *
+            ), archived AS (
+                INSERT INTO fleetflow_history_archive (res_model, res_id, vehicle_id, date, data)
+                     SELECT 'fleetflow.maintenance_log', id, vehicle_id, date, to_jsonb(moved) FROM moved
+            ), rolled AS (
+                INSERT INTO fleetflow_history_month (vehicle_id, month, fuel_count, fuel_liters, fuel_cost, fuel_distance_km, last_odometer, maintenance_count, maintenance_cost)
+                     SELECT vehicle_id, date_trunc('month', date)::date, 0, 0, 0, 0, 0, COUNT(*), SUM(cost)
+                       FROM moved
+                   GROUP BY 1, 2
+                ON CONFLICT (vehicle_id, month) DO UPDATE
+                        SET maintenance_count = fleetflow_history_month.maintenance_count + EXCLUDED.maintenance_count,
+                            maintenance_cost = fleetflow_history_month.maintenance_cost + EXCLUDED.maintenance_cost
+            )
+            SELECT COUNT(*) FROM moved
+        """, {'cutoff': cutoff})
+        maintenance_moved = cr.fetchone()[0]
+        archived_before = self._archived_before()
+        if not archived_before or cutoff > archived_before:
+            self.env['ir.config_parameter'].sudo().set_param('fleetflow.history_archived_before', fields.Date.to_string(cutoff))
+        self.env['fleetflow.fuel_log'].invalidate_model()
+        self.env['fleetflow.maintenance_log'].invalidate_model()
+        self.env['fleetflow.collection_version']._bump('fleetflow.fuel_log', 'fleetflow.maintenance_log')
+        self.invalidate_model()
+        return {'fuel_logs': fuel_moved, 'maintenance_logs': maintenance_moved, 'cutoff': cutoff}
@@ -0,0 +1,13 @@
+from odoo import models
+
+from .event_mixin import EVENT_CHANNEL
+
+
+class IrWebsocket(models.AbstractModel):
+    _inherit = 'ir.websocket'
+
+    def _build_bus_channel_list(self, channels):
+        # Change events are only for logged-in FleetFlow users, not public websocket clients.
+        if EVENT_CHANNEL in channels and not self.env.user._is_internal():
+            channels = [c for c in channels if c != EVENT_CHANNEL]
+        return super()._build_bus_channel_list(channels)
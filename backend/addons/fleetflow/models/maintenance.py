@@ -1,4 +1,10 @@
+from collections import defaultdict
 from odoo import models, fields, api
+from odoo.tools import create_index
+
+from .vehicle_month_stats import add_stat_delta
+
+TOTAL_FIELDS = {'vehicle_id', 'date', 'cost'}
 
 class MaintenanceLog(models.Model):
     _name = 'fleetflow.maintenance_log'
@@ -11,22 +17,48 @@ class MaintenanceLog(models.Model):
     cost = fields.Float(required=True)
     state = fields.Selection([('Open', 'Open'), ('Done', 'Done')], default='Open', required=True)
 
+    def init(self):
+        create_index(self._cr, 'fleetflow_maintenance_log_vehicle_state_idx', self._table, ['vehicle_id', 'state'])
+
     @api.model_create_multi
     def create(self, vals_list):
         records = super().create(vals_list)
-        for rec in records:
-            if rec.state == 'Open':
-                rec.vehicle_id.status = 'In Shop'
+        records._apply_cost(1)
+        records.filtered(lambda r: r.state == 'Open').vehicle_id.write({'status': 'In Shop'})
+        self.env['fleetflow.collection_version']._bump(self._name)
         return records
 
-    def action_done(self):
+    def write(self, vals):
+        self.env['fleetflow.collection_version']._bump(self._name)
+        if not TOTAL_FIELDS.intersection(vals):
+            return super().write(vals)
+        self._apply_cost(-1)
+        res = super().write(vals)
+        self._apply_cost(1)
+        return res
+
+    def unlink(self):
+        self._apply_cost(-1)
+        self.env['fleetflow.collection_version']._bump(self._name)
+        return super().unlink()
+
+    def _apply_cost(self, sign):
+        deltas = defaultdict(float)
+        stat_deltas = {}
         for rec in self:
-            rec.state = 'Done'
-            if rec.vehicle_id.status != 'Retired':
-                open_logs = self.search_count([
-                    ('vehicle_id', '=', rec.vehicle_id.id),
-                    ('state', '=', 'Open'),
-                    ('id', '!=', rec.id)
-                ])
-                if open_logs == 0:
-                    rec.vehicle_id.status = 'Available'
+            deltas[rec.vehicle_id.id] += sign * rec.cost
+            add_stat_delta(stat_deltas, rec.vehicle_id.id, rec.date, maintenance_cost=sign * rec.cost)
+        self.env['fleetflow.vehicle'].sudo()._apply_cost_deltas('total_maintenance_cost', deltas)
+        self.env['fleetflow.vehicle_month_stats'].sudo()._apply_deltas(stat_deltas)
+
+    def action_done(self):
+        self.write({'state': 'Done'})
+        vehicles = self.vehicle_id.filtered(lambda v: v.status != 'Retired')
+        if not vehicles:
+            return
+        still_open = self._read_group([('vehicle_id', 'in', vehicles.ids), ('state', '=', 'Open')], ['vehicle_id'])
+        busy = {vehicle.id for vehicle, in still_open}
+        released = vehicles.filtered(lambda v: v.id not in busy)
+        # A completed service resets the vehicle's next due reading.
+        self.env['fleetflow.maintenance_risk'].sudo()._score(vehicles.ids)
+        released.write({'status': 'Available'})
@@ -0,0 +1,144 @@
+import logging
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+from odoo import models, fields, api
+from odoo.tools import config
+
+_logger = logging.getLogger(__name__)
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+DEFAULT_SERVICE_INTERVAL = 5000
+CHUNK_SIZE = 10000
+FEATURES = ('odometer', 'service_odometer', 'efficiency_90d', 'efficiency_365d', 'cost_recent', 'cost_prior')
+
+
+def score_chunk(interval, odometer, service_odometer, efficiency_90d, efficiency_365d, cost_recent, cost_prior):
+    """Risk in [0, 1] and the odometer reading at which the next service is due."""
+    km_since = np.maximum(odometer - service_odometer, 0.0)
+    usage = km_since / interval
+    # Positive drift: the last 90 days burn more fuel per km than the yearly baseline.
+    valid = (efficiency_90d > 0) & (efficiency_365d > 0)
+    drift = np.zeros_like(odometer)
+    drift[valid] = np.clip(1.0 - efficiency_90d[valid] / efficiency_365d[valid], -1.0, 1.0)
+    cost_trend = (cost_recent - cost_prior) / np.maximum(np.maximum(cost_recent, cost_prior), 1.0)
+    z = 4.0 * (usage - 1.0) + 3.0 * drift + 1.5 * cost_trend
+    risk = 1.0 / (1.0 + np.exp(-z))
+    # Degrading consumption pulls the next service forward, by at most half an interval.
+    due = service_odometer + interval * (1.0 - 0.5 * np.clip(drift, 0.0, 1.0))
+    return risk, due
+
+
+class MaintenanceRisk(models.AbstractModel):
+    _name = 'fleetflow.maintenance_risk'
+    _description = 'Predictive Maintenance Scoring'
+
+    @api.model
+    def _load_features(self, vehicle_ids=None):
+        today = fields.Date.context_today(self)
+        self.env.flush_all()
+        self.env.cr.execute("""
+            WITH last_service AS (
+                SELECT vehicle_id, MAX(date) AS date
+                  FROM fleetflow_maintenance_log
+                 WHERE state = 'Done' AND (%(ids)s::int[] IS NULL OR vehicle_id = ANY(%(ids)s::int[]))
+              GROUP BY vehicle_id
+            ), archived_service AS (
+                SELECT vehicle_id, MAX(month) AS month
+                  FROM fleetflow_history_month
+                 WHERE maintenance_count > 0 AND (%(ids)s::int[] IS NULL OR vehicle_id = ANY(%(ids)s::int[]))
+              GROUP BY vehicle_id
+            ), costs AS (
+                SELECT vehicle_id,
+                       SUM(maintenance_cost) FILTER (WHERE month > %(recent)s) AS recent,
+                       SUM(maintenance_cost) FILTER (WHERE month <= %(recent)s) AS prior
+                  FROM fleetflow_vehicle_month_stats
+                 WHERE month > %(prior)s AND (%(ids)s::int[] IS NULL OR vehicle_id = ANY(%(ids)s::int[]))
+              GROUP BY vehicle_id
+            )
+            SELECT v.id, COALESCE(v.next_service_due_km, 0),
+                   COALESCE(v.odometer, 0),
+                   COALESCE(CASE WHEN ls.date IS NOT NULL THEN (
+                                SELECT MAX(f.odometer_at_fill) FROM fleetflow_fuel_log f
+                                 WHERE f.vehicle_id = v.id AND f.date <= ls.date
+                            ) END, (
+                                SELECT MAX(h.last_odometer) FROM fleetflow_history_month h
+                                 WHERE h.vehicle_id = v.id AND h.month <= COALESCE(ls.date, ars.month)
+                            ), 0),
+                   COALESCE(v.efficiency_90d, 0), COALESCE(v.efficiency_365d, 0),
+                   COALESCE(c.recent, 0), COALESCE(c.prior, 0)
+              FROM fleetflow_vehicle v
+         LEFT JOIN last_service ls ON ls.vehicle_id = v.id
+         LEFT JOIN archived_service ars ON ars.vehicle_id = v.id
+         LEFT JOIN costs c ON c.vehicle_id = v.id
+             WHERE v.status != 'Retired' AND (%(ids)s::int[] IS NULL OR v.id = ANY(%(ids)s::int[]))
+          ORDER BY v.id
+        """, {
+            'ids': list(vehicle_ids) if vehicle_ids is not None else None,
+            'recent': fields.Date.subtract(today, months=6),
+            'prior': fields.Date.subtract(today, months=12),
+        })
+        rows = self.env.cr.fetchall()
+        if not rows:
+            return None, None, {}
+        data = np.array(rows, dtype=float)
+        ids = data[:, 0].astype(np.int64)
+        old_due = data[:, 1]
+        return ids, old_due, {name: np.ascontiguousarray(data[:, 2 + i]) for i, name in enumerate(FEATURES)}
+
+    @api.model
+    def _score(self, vehicle_ids=None):
+        if np is None:
+            return 0
+        interval = float(self.env['ir.config_parameter'].sudo().get_param('fleetflow.service_interval_km', DEFAULT_SERVICE_INTERVAL)) or DEFAULT_SERVICE_INTERVAL
+        ids, old_due, features = self._load_features(vehicle_ids)
+        if ids is None:
+            return 0
+        bounds = [(start, min(start + CHUNK_SIZE, len(ids))) for start in range(0, len(ids), CHUNK_SIZE)]
+        chunks = [[interval] + [features[name][a:b] for name in FEATURES] for a, b in bounds]
+        # Scoring is plain array math, so it runs in-process unless fleetflow.risk_workers asks for more. Forking is only safe in a single-threaded prefork worker:
+        # in the threaded server it would copy locks held by other threads, and spawned children could not
+        # re-import odoo.addons modules.
+        workers = min(len(chunks), int(self.env['ir.config_parameter'].sudo().get_param('fleetflow.risk_workers', 0) or 0))
+        if workers > 1 and config['workers']:
+            # Children only crunch arrays; they never touch the cursor inherited through fork.
+            with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('fork')) as pool:
+                results = list(pool.map(score_chunk, *zip(*chunks)))
+        else:
+            results = [score_chunk(*chunk) for chunk in chunks]
+        risk = np.concatenate([r for r, _due in results])
+        due = np.concatenate([d for _risk, d in results])
+
+        Vehicle = self.env['fleetflow.vehicle']
+        Vehicle.flush_model(['maintenance_risk', 'next_service_due_km', 'write_date'])
+        self.env.cr.execute("""
+            UPDATE fleetflow_vehicle v
+               SET maintenance_risk = d.risk,
+                   next_service_due_km = d.due,
+                   write_date = now() at time zone 'UTC'
+              FROM (SELECT unnest(%s::int[]) AS id, unnest(%s::float8[]) AS risk, unnest(%s::float8[]) AS due) d
+             WHERE v.id = d.id
+               AND (v.maintenance_risk, v.next_service_due_km) IS DISTINCT FROM (d.risk, d.due)
+        """, (ids.tolist(), np.round(risk, 4).tolist(), np.round(due, 1).tolist()))
+        changed = self.env.cr.rowcount
+        Vehicle.invalidate_model(['maintenance_risk', 'next_service_due_km', 'write_date'])
+        if changed:
+            self.env['fleetflow.collection_version']._bump(Vehicle._name)
+        # Only vehicles whose "service due" state flipped need their alerts re-synced.
+        odometer = features['odometer']
+        flipped = ids[(old_due <= 0) | ((odometer >= old_due) != (odometer >= due))]
+        if len(flipped):
+            Vehicle.browse(flipped.tolist())._sync_alerts()
+        return len(ids)
+
+    @api.model
+    def _cron_score_fleet(self):
+        if np is None:
+            _logger.warning("numpy is not installed, skipping predictive maintenance scoring")
+            return
+        scored = self._score()
+        _logger.info("Scored maintenance risk for %s vehicles", scored)
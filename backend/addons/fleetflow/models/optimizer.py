@@ -0,0 +1,196 @@
+from collections import defaultdict
+
+import psycopg2
+
+from odoo import models, fields, api
+from odoo.exceptions import UserError, ValidationError
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+try:
+    from scipy.optimize import linear_sum_assignment
+except ImportError:
+    linear_sum_assignment = None
+
+# Cost of an infeasible pair; anything assigned at this cost is dropped from the plan.
+INFEASIBLE = 1e9
+
+
+def _solve_assignment(cost):
+    """Min-cost rectangular assignment, returns (rows, cols) like scipy's linear_sum_assignment."""
+    if linear_sum_assignment is not None:
+        return linear_sum_assignment(cost)
+    transposed = cost.shape[0] > cost.shape[1]
+    if transposed:
+        cost = cost.T
+    n, m = cost.shape
+    # Shortest augmenting path (Jonker-Volgenant), one row at a time, with the column scan vectorized.
+    u = np.zeros(n)
+    v = np.zeros(m)
+    col4row = np.full(n, -1)
+    row4col = np.full(m, -1)
+    for cur_row in range(n):
+        path = np.full(m, -1)
+        shortest = np.full(m, np.inf)
+        remaining = np.ones(m, dtype=bool)
+        scanned_rows = np.zeros(n, dtype=bool)
+        min_val = 0.0
+        i = cur_row
+        sink = -1
+        while sink < 0:
+            scanned_rows[i] = True
+            reduced = min_val + cost[i] - u[i] - v
+            better = remaining & (reduced < shortest)
+            shortest[better] = reduced[better]
+            path[better] = i
+            candidates = np.where(remaining, shortest, np.inf)
+            lowest = candidates.min()
+            if lowest == np.inf:
+                raise UserError("Assignment problem is infeasible.")
+            ties = np.flatnonzero(candidates == lowest)
+            free = ties[row4col[ties] < 0]
+            j = free[0] if len(free) else ties[0]
+            min_val = lowest
+            remaining[j] = False
+            if row4col[j] < 0:
+                sink = j
+            else:
+                i = row4col[j]
+        u[cur_row] += min_val
+        others = scanned_rows.copy()
+        others[cur_row] = False
+        u[others] += min_val - shortest[col4row[others]]
+        scanned_cols = ~remaining
+        v[scanned_cols] -= min_val - shortest[scanned_cols]
+        j = sink
+        while True:
+            i = path[j]
+            row4col[j] = i
+            col4row[i], j = j, col4row[i]
+            if i == cur_row:
+                break
+    rows = np.arange(n)
+    if transposed:
+        order = np.argsort(col4row)
+        return col4row[order], rows[order]
+    return rows, col4row
+
+
+class TripOptimizer(models.AbstractModel):
+    _name = 'fleetflow.optimizer'
+    _description = 'Trip Assignment Optimizer'
+
+    @api.model
+    def propose_assignment(self, trip_ids=None):
+        if np is None:
+            raise UserError("The trip optimizer requires numpy.")
+        domain = [('state', '=', 'Draft')]
+        if trip_ids:
+            domain.append(('id', 'in', list(trip_ids)))
+        trips = self.env['fleetflow.trip'].search_read(domain, ['name', 'vehicle_id', 'cargo_weight', 'planned_start_date'], order='id')
+        if not trips:
+            return {'plan': [], 'unassigned': []}
+        vehicles = self.env['fleetflow.vehicle'].search_read([('status', '=', 'Available')], ['region', 'max_load_capacity', 'odometer'], order='id')
+        today = fields.Date.context_today(self)
+        drivers = self.env['fleetflow.driver'].search_read([
+            ('status', '=', 'On Duty'),
+            ('license_expiry_date', '>=', today)
+        ], ['license_expiry_date', 'safety_score', 'trip_count'], order='id')
+
+        # A trip's region is the region of the vehicle currently on it.
+        current_vehicles = {v['id']: v['region'] for v in self.env['fleetflow.vehicle'].browse(
+            list({t['vehicle_id'][0] for t in trips})).read(['region'])}
+        trip_regions = [current_vehicles.get(t['vehicle_id'][0]) for t in trips]
+
+        vehicle_for = self._assign_vehicles(trips, trip_regions, vehicles)
+        driver_for = self._assign_drivers(trips, [i for i in range(len(trips)) if i in vehicle_for], drivers)
+
+        plan, unassigned = [], []
+        for i, trip in enumerate(trips):
+            if i in vehicle_for and i in driver_for:
+                vehicle, v_cost = vehicle_for[i]
+                driver, d_cost = driver_for[i]
+                plan.append({'trip_id': trip['id'], 'trip': trip['name'], 'vehicle_id': vehicle, 'driver_id': driver, 'cost': round(v_cost + d_cost, 4)})
+            else:
+                unassigned.append({'trip_id': trip['id'], 'trip': trip['name'], 'reason': 'No feasible vehicle' if i not in vehicle_for else 'No available driver'})
+        return {'plan': plan, 'unassigned': unassigned}
+
+    def _assign_vehicles(self, trips, trip_regions, vehicles):
+        # Regions never share vehicles, so each one is an independent (smaller) problem.
+        trips_by_region = defaultdict(list)
+        for i, region in enumerate(trip_regions):
+            trips_by_region[region].append(i)
+        vehicles_by_region = defaultdict(list)
+        for vehicle in vehicles:
+            vehicles_by_region[vehicle['region']].append(vehicle)
+        result = {}
+        for region, trip_idx in trips_by_region.items():
+            candidates = vehicles_by_region.get(region)
+            if not candidates:
+                continue
+            weights = np.array([trips[i]['cargo_weight'] for i in trip_idx], dtype=float)
+            capacity = np.array([v['max_load_capacity'] or 0.0 for v in candidates], dtype=float)
+            odometer = np.array([v['odometer'] or 0.0 for v in candidates], dtype=float)
+            # Prefer the tightest vehicle that fits, then the least worn one.
+            slack = (capacity[None, :] - weights[:, None]) / np.maximum(capacity[None, :], 1.0)
+            wear = odometer / max(odometer.max(), 1.0)
+            cost = slack + 0.1 * wear[None, :]
+            cost[slack < 0] = INFEASIBLE
+            rows, cols = _solve_assignment(cost)
+            for r, c in zip(rows, cols):
+                if cost[r, c] < INFEASIBLE:
+                    result[trip_idx[r]] = (candidates[c]['id'], float(cost[r, c]))
+        return result
+
+    def _assign_drivers(self, trips, trip_idx, drivers):
+        result = {}
+        if not trip_idx or not drivers:
+            return result
+        starts = np.array([fields.Datetime.to_datetime(trips[i]['planned_start_date']).toordinal() for i in trip_idx])
+        expiry = np.array([fields.Date.to_date(d['license_expiry_date']).toordinal() for d in drivers])
+        safety = np.array([d['safety_score'] or 0 for d in drivers], dtype=float)
+        load = np.array([d['trip_count'] or 0 for d in drivers], dtype=float)
+        # Safer drivers first, spreading work away from the busiest ones.
+        driver_cost = (100.0 - np.clip(safety, 0, 100)) / 100.0 + 0.1 * load / max(load.max(), 1.0)
+        # Every trip prices a driver the same, so no dense solve is needed: a driver can cover the
+        # trips starting before the license expires, i.e. a prefix of the trips in start order, and
+        # taking drivers cheapest first while the prefixes stay matchable (Hall's condition) is optimal.
+        order = np.argsort(starts, kind='stable')
+        reach = np.searchsorted(starts[order], expiry, side='right')
+        confined = np.zeros(len(trip_idx) + 1, dtype=int)
+        bound = np.arange(len(trip_idx) + 1)
+        chosen = []
+        for d in np.argsort(driver_cost, kind='stable'):
+            k = reach[d]
+            if k and (confined[k:] < bound[k:]).all():
+                confined[k:] += 1
+                chosen.append(d)
+                if len(chosen) == len(trip_idx):
+                    break
+        # Most constrained driver takes the earliest trip; Hall's condition keeps every pair valid.
+        chosen.sort(key=lambda d: reach[d])
+        for pos, d in enumerate(chosen):
+            result[trip_idx[order[pos]]] = (drivers[d]['id'], float(driver_cost[d]))
+        return result
+
+    @api.model
+    def apply_plan(self, plan):
+        # Steps whose assignment is rejected (e.g. a booking overlap) are skipped, the rest is dispatched.
+        Trip = self.env['fleetflow.trip']
+        skipped, ready = [], []
+        for step in plan:
+            trip = Trip.browse(int(step['trip_id'])).exists()
+            if not trip or trip.state != 'Draft':
+                skipped.append({'id': int(step['trip_id']), 'status': 'skipped', 'reason': "Trip is no longer a draft."})
+                continue
+            try:
+                with self.env.cr.savepoint():
+                    trip.write({'vehicle_id': int(step['vehicle_id']), 'driver_id': int(step['driver_id'])})
+            except (ValidationError, psycopg2.IntegrityError) as e:
+                skipped.append({'id': trip.id, 'status': 'skipped', 'reason': str(e)})
+                continue
+            ready.append(trip.id)
+        return Trip.dispatch_batch(ready) + skipped
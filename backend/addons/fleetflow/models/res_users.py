@@ -0,0 +1,39 @@
+from odoo import models, tools
+
+ROLE_GROUPS = [
+    ('manager', 'fleetflow.group_fleet_manager'),
+    ('dispatcher', 'fleetflow.group_dispatcher'),
+    ('safety', 'fleetflow.group_safety_officer'),
+    ('finance', 'fleetflow.group_financial_analyst'),
+]
+ROLE_BITS = {role: 1 << i for i, (role, _xmlid) in enumerate(ROLE_GROUPS)}
+
+def _touches_groups(vals):
+    return 'groups_id' in vals or any(k.startswith(('in_group_', 'sel_groups_')) for k in vals)
+
+class ResUsers(models.Model):
+    _inherit = 'res.users'
+
+    @tools.ormcache('self.id')
+    def _fleetflow_role_mask(self):
+        self.ensure_one()
+        mask = 0
+        for role, xmlid in ROLE_GROUPS:
+            if self.has_group(xmlid):
+                mask |= ROLE_BITS[role]
+        return mask
+
+    def write(self, vals):
+        res = super().write(vals)
+        if _touches_groups(vals):
+            self.env.registry.clear_cache()
+        return res
+
+class ResGroups(models.Model):
+    _inherit = 'res.groups'
+
+    def write(self, vals):
+        res = super().write(vals)
+        if 'users' in vals or 'implied_ids' in vals:
+            self.env.registry.clear_cache()
+        return res
@@ -0,0 +1,216 @@
+import csv
+import logging
+import os
+
+from odoo import models, fields, api, tools
+
+_logger = logging.getLogger(__name__)
+
+PRELOAD_CHUNK_SIZE = 5000
+
+
+def normalize_location(name):
+    return ' '.join((name or '').split()).casefold()
+
+
+class UnknownLane(LookupError):
+    """Raised by the cached lookup on a miss, so only known lanes are ever cached."""
+
+
+class Location(models.Model):
+    _name = 'fleetflow.location'
+    _description = 'Route Location'
+    _order = 'name'
+    _log_access = False
+
+    key = fields.Char(required=True, readonly=True)
+    name = fields.Char(required=True)
+
+    _sql_constraints = [
+        ('unique_key', 'unique(key)', 'Location already exists!')
+    ]
+
+    @api.model
+    def _ensure(self, names):
+        # name -> location id, creating missing locations in one upsert.
+        keys = {normalize_location(n): n.strip() for n in names if normalize_location(n)}
+        if not keys:
+            return {}
+        self.env.cr.execute("""
+            INSERT INTO fleetflow_location (key, name)
+                 SELECT * FROM unnest(%s::varchar[], %s::varchar[])
+            ON CONFLICT (key) DO NOTHING
+        """, (list(keys), list(keys.values())))
+        self.env.cr.execute("SELECT key, id FROM fleetflow_location WHERE key = ANY(%s)", (list(keys),))
+        ids = dict(self.env.cr.fetchall())
+        self.invalidate_model()
+        return {n: ids[normalize_location(n)] for n in names if normalize_location(n) in ids}
+
+    def unlink(self):
+        # Cascades to the lanes of these locations.
+        res = super().unlink()
+        self.env.registry.clear_cache()
+        return res
+
+
+class Lane(models.Model):
+    _name = 'fleetflow.lane'
+    _description = 'Route Lane Distance'
+    _log_access = False
+
+    source_id = fields.Many2one('fleetflow.location', required=True, ondelete='cascade')
+    destination_id = fields.Many2one('fleetflow.location', required=True, ondelete='cascade', index=True)
+    distance_km = fields.Float(required=True)
+
+    _sql_constraints = [
+        ('unique_lane', 'unique(source_id, destination_id)', 'Lane already exists!')
+    ]
+
+    # Only hits are cached, so a new lane needs no invalidation unless its reverse direction was
+    # already answering lookups for it. Changing or removing a known lane clears the registry cache.
+    @api.model_create_multi
+    def create(self, vals_list):
+        records = super().create(vals_list)
+        if records._has_reverse():
+            self.env.registry.clear_cache()
+        return records
+
+    def write(self, vals):
+        res = super().write(vals)
+        self.env.registry.clear_cache()
+        return res
+
+    def unlink(self):
+        res = super().unlink()
+        self.env.registry.clear_cache()
+        return res
+
+    def _has_reverse(self):
+        if not self:
+            return False
+        self.flush_model()
+        self.env.cr.execute("""
+            SELECT 1
+              FROM fleetflow_lane l
+              JOIN fleetflow_lane r ON r.source_id = l.destination_id AND r.destination_id = l.source_id
+             WHERE l.id = ANY(%s)
+             LIMIT 1
+        """, (self.ids,))
+        return bool(self.env.cr.fetchone())
+
+    @api.model
+    def lookup(self, source, destination):
+        try:
+            return self._cached_distance(normalize_location(source), normalize_location(destination))
+        except UnknownLane:
+            return None
+
+    @api.model
+    def lookup_many(self, pairs):
+        """Resolve many (source, destination) names in one query; returns {(source key, destination key): km} for known lanes."""
+        keys = list({(normalize_location(s), normalize_location(d)) for s, d in pairs if normalize_location(s) and normalize_location(d)})
+        if not keys:
+            return {}
+        self.flush_model()
+        self.env.cr.execute("""
+            SELECT p.source_key, p.destination_key, x.distance_km
+              FROM unnest(%s::varchar[], %s::varchar[]) AS p(source_key, destination_key)
+              JOIN fleetflow_location s ON s.key = p.source_key
+              JOIN fleetflow_location d ON d.key = p.destination_key
+        CROSS JOIN LATERAL (
+                    SELECT l.distance_km
+                      FROM fleetflow_lane l
+                     WHERE (l.source_id, l.destination_id) IN ((s.id, d.id), (d.id, s.id))
+                  ORDER BY l.source_id = s.id DESC
+                     LIMIT 1
+              ) x
+        """, ([k[0] for k in keys], [k[1] for k in keys]))
+        return {(source_key, destination_key): km for source_key, destination_key, km in self.env.cr.fetchall()}
+
+    @tools.ormcache('source_key', 'destination_key')
+    def _cached_distance(self, source_key, destination_key):
+        # A lane is assumed symmetric unless both directions are recorded.
+        self.env.cr.execute("""
+            SELECT l.distance_km
+              FROM fleetflow_lane l
+              JOIN fleetflow_location s ON s.id = l.source_id
+              JOIN fleetflow_location d ON d.id = l.destination_id
+             WHERE (s.key = %s AND d.key = %s) OR (s.key = %s AND d.key = %s)
+          ORDER BY s.key = %s DESC
+             LIMIT 1
+        """, (source_key, destination_key, destination_key, source_key, source_key))
+        row = self.env.cr.fetchone()
+        if not row:
+            raise UnknownLane(source_key, destination_key)
+        return row[0]
+
+    @api.model
+    def _upsert(self, lanes, overwrite=True):
+        # lanes: iterable of (source name, destination name, distance_km)
+        lanes = [(s, d, km) for s, d, km in lanes if km and km > 0 and normalize_location(s) and normalize_location(d)]
+        if not lanes:
+            return 0
+        location_ids = self.env['fleetflow.location']._ensure({name for s, d, _km in lanes for name in (s, d)})
+        rows = {}
+        for s, d, km in lanes:
+            rows[(location_ids[s], location_ids[d])] = km
+        keys = list(rows)
+        self.flush_model()
+        # Each returned row is an insert or an actual distance change; the flag marks rows that may be cached.
+        self.env.cr.execute(f"""
+            INSERT INTO fleetflow_lane AS l (source_id, destination_id, distance_km)
+                 SELECT * FROM unnest(%s::int[], %s::int[], %s::float8[])
+            ON CONFLICT (source_id, destination_id) DO {
+                'UPDATE SET distance_km = EXCLUDED.distance_km WHERE l.distance_km IS DISTINCT FROM EXCLUDED.distance_km'
+                if overwrite else 'NOTHING'}
+              RETURNING l.xmax <> 0 OR EXISTS (
+                        SELECT 1 FROM fleetflow_lane r WHERE r.source_id = l.destination_id AND r.destination_id = l.source_id)
+        """, ([k[0] for k in keys], [k[1] for k in keys], [rows[k] for k in keys]))
+        flags = [row[0] for row in self.env.cr.fetchall()]
+        self.invalidate_model()
+        if any(flags):
+            self.env.registry.clear_cache()
+        return len(flags)
+
+    @api.model
+    def _learn(self, lanes, known=None):
+        # Trips entered with an explicit distance seed lanes we do not know yet; known is a lookup_many() result.
+        lanes = list({(normalize_location(s), normalize_location(d)): (s, d, km) for s, d, km in lanes}.items())
+        if known is None:
+            known = self.lookup_many([(s, d) for _key, (s, d, _km) in lanes])
+        unknown = [lane for key, lane in lanes if key not in known]
+        return self._upsert(unknown, overwrite=False) if unknown else 0
+
+    @api.model
+    def preload_matrix(self, lines):
+        """Load a CSV distance matrix: header row of destinations, one row per source."""
+        reader = csv.reader(lines)
+        header = next(reader, [])
+        destinations = [d.strip() for d in header[1:]]
+        loaded, chunk = 0, []
+        for row in reader:
+            if not row:
+                continue
+            source = row[0].strip()
+            for destination, cell in zip(destinations, row[1:]):
+                cell = cell.strip()
+                if cell and destination:
+                    chunk.append((source, destination, float(cell)))
+            if len(chunk) >= PRELOAD_CHUNK_SIZE:
+                loaded += self._upsert(chunk)
+                chunk = []
+        loaded += self._upsert(chunk)
+        return loaded
+
+    @api.model
+    def _preload_configured_matrix(self):
+        path = self.env['ir.config_parameter'].sudo().get_param('fleetflow.lane_matrix_path')
+        if not path:
+            return 0
+        if not os.path.isfile(path):
+            _logger.warning("Lane distance matrix %s not found", path)
+            return 0
+        with open(path, newline='', encoding='utf-8-sig') as f:
+            loaded = self.preload_matrix(f)
+        _logger.info("Preloaded %s lanes from %s", loaded, path)
+        return loaded
@@ -1,8 +1,15 @@
 from odoo import models, fields, api
 from odoo.exceptions import ValidationError
 
+from .analytics import invalidate_dashboard_cache
+from .maintenance_risk import DEFAULT_SERVICE_INTERVAL
+
+ALERT_FIELDS = {'status', 'odometer', 'name', 'license_plate'}
+KPI_FIELDS = {'status', 'region', 'vehicle_type'}
+
 class Vehicle(models.Model):
     _name = 'fleetflow.vehicle'
+    _inherit = ['fleetflow.event.mixin']
     _description = 'Fleet Vehicle'
 
     name = fields.Char(string='Model', required=True)
@@ -27,24 +34,124 @@ class Vehicle(models.Model):
     maintenance_log_ids = fields.One2many('fleetflow.maintenance_log', 'vehicle_id')
     trip_ids = fields.One2many('fleetflow.trip', 'vehicle_id')
 
-    total_fuel_cost = fields.Float(compute='_compute_costs', store=True)
-    total_maintenance_cost = fields.Float(compute='_compute_costs', store=True)
-    total_operational_cost = fields.Float(compute='_compute_costs', store=True)
-    fuel_efficiency = fields.Float(compute='_compute_efficiency', store=True)
+    # Running totals maintained by fuel/maintenance log deltas, see _apply_cost_deltas().
+    total_fuel_cost = fields.Float(default=0, readonly=True)
+    total_maintenance_cost = fields.Float(default=0, readonly=True)
+    total_operational_cost = fields.Float(default=0, readonly=True)
+    # km/l from per-fill segments aggregated in fleetflow.fuel_bucket, see _refresh_vehicle_efficiency().
+    fuel_efficiency = fields.Float(default=0, readonly=True)
+    efficiency_30d = fields.Float(default=0, readonly=True)
+    efficiency_90d = fields.Float(default=0, readonly=True)
+    efficiency_365d = fields.Float(default=0, readonly=True)
+    # Written by the predictive maintenance job, see fleetflow.maintenance_risk.
+    maintenance_risk = fields.Float(default=0, readonly=True)
+    next_service_due_km = fields.Float(default=0, readonly=True)
+    # Rolling fuel consumption (L/100km) used to score new fills, see FuelLog._detect_anomalies().
+    fuel_ewma_mean = fields.Float(default=0, readonly=True)
+    fuel_ewma_var = fields.Float(default=0, readonly=True)
+    fuel_sample_count = fields.Integer(default=0, readonly=True)
+    fuel_last_odometer = fields.Float(readonly=True)
 
     _sql_constraints = [
         ('unique_license_plate', 'unique(license_plate)', 'License plate must be unique!')
     ]
 
-    @api.depends('fuel_log_ids.cost', 'maintenance_log_ids.cost')
-    def _compute_costs(self):
-        for rec in self:
-            rec.total_fuel_cost = sum(rec.fuel_log_ids.mapped('cost'))
-            rec.total_maintenance_cost = sum(rec.maintenance_log_ids.mapped('cost'))
-            rec.total_operational_cost = rec.total_fuel_cost + rec.total_maintenance_cost
-
-    @api.depends('fuel_log_ids.liters', 'odometer')
-    def _compute_efficiency(self):
-        for rec in self:
-            total_liters = sum(rec.fuel_log_ids.mapped('liters'))
-            rec.fuel_efficiency = (rec.odometer / total_liters) if total_liters > 0 else 0
+    @api.model_create_multi
+    def create(self, vals_list):
+        records = super().create(vals_list)
+        records._sync_alerts()
+        invalidate_dashboard_cache(self.env)
+        return records
+
+    def write(self, vals):
+        res = super().write(vals)
+        if ALERT_FIELDS.intersection(vals):
+            self._sync_alerts()
+        if KPI_FIELDS.intersection(vals):
+            invalidate_dashboard_cache(self.env)
+        return res
+
+    def unlink(self):
+        self.env['fleetflow.alert'].sudo()._sync(self._alert_keys(), {})
+        invalidate_dashboard_cache(self.env)
+        return super().unlink()
+
+    def _alert_keys(self):
+        return [key for v in self for key in (f'v_shop_{v.id}', f'v_maint_{v.id}')]
+
+    def _sync_alerts(self):
+        alerts = self.env['fleetflow.alert'].sudo()
+        wanted = {}
+        for v in self:
+            if v.status == 'In Shop':
+                wanted[f'v_shop_{v.id}'] = alerts._alert_vals(v, 'Vehicle In Shop', f'{v.name} ({v.license_plate}) is undergoing maintenance.', 'info')
+            elif v.status == 'Available' and v.odometer >= (v.next_service_due_km or DEFAULT_SERVICE_INTERVAL):
+                due = v.next_service_due_km or DEFAULT_SERVICE_INTERVAL
+                wanted[f'v_maint_{v.id}'] = alerts._alert_vals(v, 'Maintenance Due', f'{v.name} ({v.license_plate}) has reached its next service at {due:.0f}km (risk {v.maintenance_risk:.0%}).', 'warning')
+        alerts._sync(self._alert_keys(), wanted)
+
+    @api.model
+    def available_between(self, start, end, min_capacity=0, region=None):
+        # Vehicles without an open trip overlapping [start, end), served by the trip window GiST index.
+        params = {'start': start, 'end': end, 'capacity': min_capacity or 0, 'region': region or None}
+        self.env['fleetflow.trip'].flush_model(['vehicle_id', 'state', 'planned_start_date', 'planned_end_date'])
+        self.flush_model(['status', 'region', 'max_load_capacity'])
+        self.env.cr.execute("""
+            SELECT v.id
+              FROM fleetflow_vehicle v
+             WHERE v.status NOT IN ('In Shop', 'Retired')
+               AND v.max_load_capacity >= %(capacity)s
+               AND (%(region)s::varchar IS NULL OR v.region = %(region)s)
+               AND NOT EXISTS (
+                    SELECT 1
+                      FROM fleetflow_trip t
+                     WHERE t.vehicle_id = v.id
+                       AND t.state IN ('Draft', 'Dispatched')
+                       AND tsrange(t.planned_start_date, t.planned_end_date) && tsrange(%(start)s, %(end)s)
+               )
+          ORDER BY v.max_load_capacity, v.id
+        """, params)
+        return self.browse([row[0] for row in self.env.cr.fetchall()])
+
+    @api.model
+    def _apply_cost_deltas(self, column, deltas):
+        assert column in ('total_fuel_cost', 'total_maintenance_cost')
+        deltas = {vid: delta for vid, delta in deltas.items() if vid and delta}
+        if not deltas:
+            return
+        self.flush_model([column, 'total_operational_cost'])
+        self.env.cr.execute(f"""
+            UPDATE fleetflow_vehicle v
+               SET {column} = COALESCE(v.{column}, 0) + d.delta,
+                   total_operational_cost = COALESCE(v.total_operational_cost, 0) + d.delta
+              FROM (SELECT unnest(%s::int[]) AS id, unnest(%s::float8[]) AS delta) d
+             WHERE v.id = d.id
+        """, (list(deltas), list(deltas.values())))
+        self.invalidate_model([column, 'total_operational_cost'])
+
+    @api.model
+    def _rebuild_cost_totals(self):
+        self.env.flush_all()
+        self.env.cr.execute("""
+            UPDATE fleetflow_vehicle v
+               SET total_fuel_cost = t.fuel_cost,
+                   total_maintenance_cost = t.maintenance_cost,
+                   total_operational_cost = t.fuel_cost + t.maintenance_cost
+              FROM (
+                    SELECT v2.id,
+                           COALESCE(f.cost, 0) + COALESCE(h.fuel_cost, 0) AS fuel_cost,
+                           COALESCE(m.cost, 0) + COALESCE(h.maintenance_cost, 0) AS maintenance_cost
+                      FROM fleetflow_vehicle v2
+                 LEFT JOIN (SELECT vehicle_id, SUM(cost) AS cost FROM fleetflow_fuel_log GROUP BY vehicle_id) f ON f.vehicle_id = v2.id
+                 LEFT JOIN (SELECT vehicle_id, SUM(cost) AS cost FROM fleetflow_maintenance_log GROUP BY vehicle_id) m ON m.vehicle_id = v2.id
+                 LEFT JOIN (
+                            SELECT vehicle_id, SUM(fuel_cost) AS fuel_cost, SUM(maintenance_cost) AS maintenance_cost
+                              FROM fleetflow_history_month
+                          GROUP BY vehicle_id
+                      ) h ON h.vehicle_id = v2.id
+              ) t
+             WHERE t.id = v.id
+        """)
+        self.invalidate_model(['total_fuel_cost', 'total_maintenance_cost', 'total_operational_cost'])
+        self.env['fleetflow.collection_version']._bump(self._name)
+
@@ -0,0 +1,128 @@
+from odoo import models, fields, api
+from odoo.exceptions import UserError
+
+STAT_COLUMNS = ('trip_count', 'revenue', 'distance_km', 'fuel_liters', 'fuel_cost', 'maintenance_cost')
+GROUP_COLUMNS = {
+    'vehicle': 'v.id',
+    'vehicle_type': 'v.vehicle_type',
+    'region': 'v.region',
+    'month': "to_char(s.month, 'YYYY-MM')",
+}
+
+
+def add_stat_delta(deltas, vehicle_id, day, **values):
+    # deltas: (vehicle_id, first day of month) -> {column: delta}
+    if not vehicle_id or not day:
+        return deltas
+    bucket = deltas.setdefault((vehicle_id, fields.Date.to_date(day).replace(day=1)), {})
+    for column, value in values.items():
+        bucket[column] = bucket.get(column, 0) + (value or 0)
+    return deltas
+
+
+class VehicleMonthStats(models.Model):
+    _name = 'fleetflow.vehicle_month_stats'
+    _description = 'Vehicle Monthly Financials'
+    _order = 'vehicle_id, month'
+    _log_access = False
+
+    vehicle_id = fields.Many2one('fleetflow.vehicle', required=True, ondelete='cascade', index=True)
+    month = fields.Date(required=True, index=True)
+    trip_count = fields.Integer(default=0)
+    revenue = fields.Float(default=0)
+    distance_km = fields.Float(default=0)
+    fuel_liters = fields.Float(default=0)
+    fuel_cost = fields.Float(default=0)
+    maintenance_cost = fields.Float(default=0)
+
+    _sql_constraints = [
+        ('unique_vehicle_month', 'unique(vehicle_id, month)', 'One stats row per vehicle and month!')
+    ]
+
+    @api.model
+    def _apply_deltas(self, deltas):
+        deltas = {key: d for key, d in deltas.items() if any(d.values())}
+        if not deltas:
+            return
+        keys = list(deltas)
+        columns = ', '.join(STAT_COLUMNS)
+        self.flush_model()
+        self.env.cr.execute(f"""
+            INSERT INTO fleetflow_vehicle_month_stats (vehicle_id, month, {columns})
+                 SELECT * FROM unnest(%s::int[], %s::date[], %s::int[], {', '.join(['%s::float8[]'] * (len(STAT_COLUMNS) - 1))})
+            ON CONFLICT (vehicle_id, month) DO UPDATE
+                    SET {', '.join(f'{c} = fleetflow_vehicle_month_stats.{c} + EXCLUDED.{c}' for c in STAT_COLUMNS)}
+        """, [[k[0] for k in keys], [k[1] for k in keys]] + [[deltas[k].get(c, 0) for k in keys] for c in STAT_COLUMNS])
+        self.invalidate_model()
+
+    @api.model
+    def _rebuild(self):
+        # Archived fuel and maintenance months only survive in fleetflow.history_month.
+        self.env.flush_all()
+        self.env.cr.execute(f"""
+            DELETE FROM fleetflow_vehicle_month_stats;
+            INSERT INTO fleetflow_vehicle_month_stats (vehicle_id, month, {', '.join(STAT_COLUMNS)})
+                 SELECT vehicle_id, month, SUM(trip_count), SUM(revenue), SUM(distance_km), SUM(fuel_liters), SUM(fuel_cost), SUM(maintenance_cost)
+                   FROM (
+                        SELECT vehicle_id, date_trunc('month', planned_start_date)::date AS month,
+                               1 AS trip_count, revenue, distance_km, 0.0 AS fuel_liters, 0.0 AS fuel_cost, 0.0 AS maintenance_cost
+                          FROM fleetflow_trip
+                         WHERE state = 'Completed'
+                     UNION ALL
+                        SELECT vehicle_id, date_trunc('month', date)::date, 0, 0.0, 0.0, liters, cost, 0.0 FROM fleetflow_fuel_log
+                     UNION ALL
+                        SELECT vehicle_id, date_trunc('month', date)::date, 0, 0.0, 0.0, 0.0, 0.0, cost FROM fleetflow_maintenance_log
+                     UNION ALL
+                        SELECT vehicle_id, month, 0, 0.0, 0.0, fuel_liters, fuel_cost, maintenance_cost FROM fleetflow_history_month
+                   ) facts
+               GROUP BY vehicle_id, month
+        """)
+        self.invalidate_model()
+
+    @api.model
+    def get_stats(self, group_by='month', vehicle_ids=None, vehicle_type=None, region=None, date_from=None, date_to=None):
+        if group_by not in GROUP_COLUMNS:
+            raise UserError(f"Unsupported group_by: {group_by}")
+        clauses, params = [], []
+        if vehicle_ids:
+            clauses.append("v.id = ANY(%s)")
+            params.append(list(vehicle_ids))
+        if vehicle_type:
+            clauses.append("v.vehicle_type = %s")
+            params.append(vehicle_type)
+        if region:
+            clauses.append("v.region = %s")
+            params.append(region)
+        if date_from:
+            clauses.append("s.month >= date_trunc('month', %s::date)")
+            params.append(date_from)
+        if date_to:
+            clauses.append("s.month <= %s")
+            params.append(date_to)
+        where = ('WHERE ' + ' AND '.join(clauses)) if clauses else ''
+        self.flush_model()
+        self.env.cr.execute(f"""
+            SELECT {GROUP_COLUMNS[group_by]}, {', '.join(f'SUM(s.{c})' for c in STAT_COLUMNS)}, COUNT(DISTINCT v.id)
+              FROM fleetflow_vehicle_month_stats s
+              JOIN fleetflow_vehicle v ON v.id = s.vehicle_id
+              {where}
+          GROUP BY 1
+          ORDER BY 1
+        """, params)
+        rows = []
+        for key, trip_count, revenue, distance_km, fuel_liters, fuel_cost, maintenance_cost, vehicle_count in self.env.cr.fetchall():
+            operational_cost = fuel_cost + maintenance_cost
+            rows.append({
+                'key': key,
+                'trip_count': trip_count,
+                'revenue': revenue,
+                'distance_km': distance_km,
+                'fuel_liters': fuel_liters,
+                'fuel_cost': fuel_cost,
+                'maintenance_cost': maintenance_cost,
+                'operational_cost': operational_cost,
+                'profit': revenue - operational_cost,
+                'cost_per_km': (operational_cost / distance_km) if distance_km else 0,
+                'vehicle_count': vehicle_count,
+            })
+        return rows
@@ -1,8 +1,8 @@
-import React, { useState } from 'react';
+import React, { useEffect, useState } from 'react';
 import { Box, Drawer, List, ListItemText, AppBar, Toolbar, Typography, Button, IconButton, Badge, Avatar, ListItemButton, ListItemIcon, Popover, Divider, Chip } from '@mui/material';
 import { Outlet, useNavigate, useLocation } from 'react-router-dom';
 import axios from 'axios';
-import { useQuery } from '@tanstack/react-query';
+import { useQuery, useQueryClient } from '@tanstack/react-query';
 import {
   Menu as MenuIcon,
   Notifications as NotificationsIcon,
@@ -21,10 +21,19 @@ import {
 
 const drawerWidth = 260;
 
+// Change events from the fleetflow_events bus channel mapped to the queries they make stale.
+const EVENT_QUERY_KEYS: Record<string, string[]> = {
+  'fleetflow.trip': ['trips', 'dashboard', 'analytics'],
+  'fleetflow.vehicle': ['vehicles', 'dashboard', 'analytics'],
+  'fleetflow.driver': ['drivers'],
+  'fleetflow.alert': ['alerts'],
+};
+
 export default function Layout() {
   const navigate = useNavigate();
   const location = useLocation();
   const [mobileOpen, setMobileOpen] = useState(false);
+  const queryClient = useQueryClient();
 
   const { data: user } = useQuery({
     queryKey: ['user'],
@@ -35,10 +44,42 @@ export default function Layout() {
 
   const { data: alerts } = useQuery({
     queryKey: ['alerts'],
-    queryFn: async () => (await axios.get('/api/alerts')).data,
-    refetchInterval: 10000
+    queryFn: async () => (await axios.get('/api/alerts')).data
   });
 
+  useEffect(() => {
+    let socket: WebSocket | null = null;
+    let retry: ReturnType<typeof setTimeout> | undefined;
+    let closed = false;
+    let lastId = 0;
+    const connect = () => {
+      const protocol = window.location.protocol === 'https:' ? 'wss:' : 'ws:';
+      socket = new WebSocket(`${protocol}//${window.location.host}/websocket`);
+      socket.onopen = () => {
+        // The bus replays notifications after lastId; alerts are refetched in case the backlog was pruned.
+        socket?.send(JSON.stringify({ event_name: 'subscribe', data: { channels: ['fleetflow_events'], last: lastId } }));
+        queryClient.invalidateQueries({ queryKey: ['alerts'] });
+      };
+      socket.onmessage = (event) => {
+        for (const notification of JSON.parse(event.data)) {
+          lastId = Math.max(lastId, notification.id);
+          if (notification.message?.type !== 'fleetflow/event') continue;
+          const payload = notification.message.payload;
+          (EVENT_QUERY_KEYS[payload.model] || []).forEach((key) => queryClient.invalidateQueries({ queryKey: [key] }));
+        }
+      };
+      socket.onclose = () => {
+        if (!closed) retry = setTimeout(connect, 3000);
+      };
+    };
+    connect();
+    return () => {
+      closed = true;
+      clearTimeout(retry);
+      socket?.close();
+    };
+  }, [queryClient]);
+
   const [anchorEl, setAnchorEl] = useState<null | HTMLElement>(null);
   const handleAlertsClick = (event: React.MouseEvent<HTMLElement>) => setAnchorEl(event.currentTarget);
   const handleAlertsClose = () => setAnchorEl(null);
@@ -1,5 +1,5 @@
 import React, { useState } from 'react';
-import { useQuery, useMutation, useQueryClient } from '@tanstack/react-query';
+import { QueryClient, useQuery, useMutation, useQueryClient } from '@tanstack/react-query';
 import { Box, Typography, Grid, Paper, TextField, Button, MenuItem, Select, FormControl, InputLabel, Chip, Autocomplete, Stepper, Step, StepLabel, IconButton } from '@mui/material';
 import { WarningAmber as WarningIcon, LocalShipping as TruckIcon, Person as PersonIcon, Route as RouteIcon, Check as CheckIcon, Cancel as CancelIcon } from '@mui/icons-material';
 import axios from 'axios';
@@ -8,11 +8,21 @@ const fetchTrips = async () => (await axios.get('/api/trips')).data;
 const fetchVehicles = async () => (await axios.get('/api/vehicles')).data;
 const fetchDrivers = async () => (await axios.get('/api/drivers')).data;
 
+// Loads all three lists in one round trip and seeds their individual query caches.
+const bootstrapPage = async (queryClient: QueryClient) => {
+    const { data } = await axios.post('/api/batch', { requests: [{ resource: 'trips' }, { resource: 'vehicles' }, { resource: 'drivers' }] });
+    data.results.forEach((r: any) => {
+        if (r.status === 200) queryClient.setQueryData([r.resource], r.data);
+    });
+    return true;
+};
+
 export default function Trips() {
     const queryClient = useQueryClient();
-    const { data: trips } = useQuery({ queryKey: ['trips'], queryFn: fetchTrips });
-    const { data: vehicles } = useQuery({ queryKey: ['vehicles'], queryFn: fetchVehicles });
-    const { data: drivers } = useQuery({ queryKey: ['drivers'], queryFn: fetchDrivers });
+    const { isFetched: bootstrapped } = useQuery({ queryKey: ['trips-bootstrap'], queryFn: () => bootstrapPage(queryClient), staleTime: Infinity });
+    const { data: trips } = useQuery({ queryKey: ['trips'], queryFn: fetchTrips, enabled: bootstrapped, staleTime: 10000 });
+    const { data: vehicles } = useQuery({ queryKey: ['vehicles'], queryFn: fetchVehicles, enabled: bootstrapped, staleTime: 10000 });
+    const { data: drivers } = useQuery({ queryKey: ['drivers'], queryFn: fetchDrivers, enabled: bootstrapped, staleTime: 10000 });
 
     const [newTrip, setNewTrip] = useState({
         vehicle_id: null as any,
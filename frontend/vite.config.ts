@@ -8,6 +8,11 @@ export default defineConfig({
       '/api': {
         target: 'http://odoo:8069',
         changeOrigin: true
+      },
+      '/websocket': {
+        target: 'ws://odoo:8069',
+        ws: true,
+        changeOrigin: true
       }
     }
   }